@@ -0,0 +1,493 @@
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, product
+
+import django
+from django.conf import settings
+from django.db import (OperationalError, close_old_connections, connection,
+                       transaction)
+from django.db.models import Q
+from django.template.backends.django import DjangoTemplates
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+
+from . import search, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .settings import PAGINATOR_PAGE_SIZE
+
+BATCH_SIZE = 500
+PERCENTILES = (50, 95, 99)
+# Словарь синтетических текстов: слова из слогов, частоты по закону
+# Ципфа, как в живом языке - немного частых слов и длинный хвост редких
+SYLLABLES = ("ба", "ве", "ги", "до", "жу", "за", "ки", "ло",
+             "му", "не", "по", "ру", "са", "ти", "фу", "ха")
+WORDS = ["".join(syllables) for length in (2, 3)
+         for syllables in product(SYLLABLES, repeat=length)]
+WORD_WEIGHTS = list(accumulate(1 / rank for rank in range(1, len(WORDS) + 1)))
+# Для поиска берём слова средней и низкой частоты
+SEARCH_WORDS = WORDS[20:2000]
+
+FEEDS = ("rss", "atom", "json")
+# Комментарий отправляется формой, остальные страницы открываются GET
+COMMENT = {"text": "Комментарий из бенчмарка"}
+# Маршрут -> (нужен ли вход, функция выбора аргументов)
+ROUTES = {
+    "index": (False, lambda data, rng: {}),
+    "group": (False, lambda data, rng: {"slug": rng.choice(data["groups"])}),
+    "index_feed": (False, lambda data, rng: {"fmt": rng.choice(FEEDS)}),
+    "group_feed": (False, lambda data, rng: {
+        "slug": rng.choice(data["groups"]),
+        "fmt": rng.choice(FEEDS)
+    }),
+    "new_post": (True, lambda data, rng: {}),
+    "follow_index": (True, lambda data, rng: {}),
+    "profile": (
+        False,
+        lambda data, rng: {"username": rng.choice(data["users"])}
+    ),
+    "profile_feed": (False, lambda data, rng: {
+        "username": rng.choice(data["users"]),
+        "fmt": rng.choice(FEEDS)
+    }),
+    "post": (False, lambda data, rng: dict(rng.choice(data["posts"]))),
+    "post_comments": (
+        False,
+        lambda data, rng: dict(rng.choice(data["posts"]))
+    ),
+    "post_edit": (True, lambda data, rng: dict(rng.choice(data["own"]))),
+    "add_comment": (True, lambda data, rng: dict(rng.choice(data["posts"]))),
+    "profile_follow": (
+        True,
+        lambda data, rng: {"username": rng.choice(data["users"][1:])}
+    ),
+    "profile_unfollow": (
+        True,
+        lambda data, rng: {"username": rng.choice(data["users"][1:])}
+    ),
+    "search": (False, lambda data, rng: {}),
+    "trending": (False, lambda data, rng: {}),
+    "signup": (False, lambda data, rng: {}),
+}
+# Параметры строки запроса для маршрутов, которым они нужны
+QUERY_STRINGS = {
+    "search": lambda rng: "?q=" + rng.choice(SEARCH_WORDS),
+}
+
+
+def isolated_caches():
+    """Кеши с собственным префиксом ключей: замер начинается с пустого
+    кеша и не трогает чужие ключи, даже если кеш общий с сайтом."""
+    prefix = "benchmark-{}".format(os.urandom(4).hex())
+    isolated = {}
+    for alias, params in settings.CACHES.items():
+        params = dict(params)
+        params["KEY_PREFIX"] = ":".join(
+            part for part in (params.get("KEY_PREFIX"), prefix) if part
+        )
+        isolated[alias] = params
+    return override_settings(CACHES=isolated)
+
+
+@contextmanager
+def isolated_database(name=None):
+    """Отдельная тестовая база, чтобы замеры не трогали рабочие данные.
+    name - файл базы, если нужна не в памяти (SQLite)."""
+    test_settings = connection.settings_dict["TEST"]
+    old_test_name = test_settings["NAME"]
+    if name:
+        test_settings["NAME"] = name
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  autoclobber=True)
+    try:
+        with override_settings(DEBUG=False), isolated_caches():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        test_settings["NAME"] = old_test_name
+
+
+def sentence(rng, length=12):
+    return " ".join(rng.choices(WORDS, cum_weights=WORD_WEIGHTS, k=length))
+
+
+def seed(users=50, groups=5, posts=1000, comments=2000, follows=500,
+         seed=0):
+    """Создаёт синтетические данные и возвращает то, из чего
+    собираются адреса запросов."""
+    rng = random.Random(seed)
+    User.objects.bulk_create(
+        [User(username="bench{}".format(i), password="!")
+         for i in range(users)],
+        batch_size=BATCH_SIZE
+    )
+    Group.objects.bulk_create(
+        [Group(title="Группа {}".format(i), slug="bench-{}".format(i),
+               description="Синтетическая группа")
+         for i in range(groups)],
+        batch_size=BATCH_SIZE
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith="bench"
+    ).order_by("pk").values_list("pk", flat=True))
+    group_ids = list(Group.objects.filter(
+        slug__startswith="bench-"
+    ).values_list("pk", flat=True))
+    Post.objects.bulk_create(
+        [Post(text=sentence(rng),
+              author_id=user_ids[i % users],
+              group_id=rng.choice(group_ids + [None]))
+         for i in range(posts)],
+        batch_size=BATCH_SIZE
+    )
+    # auto_now_add ставит всем постам одно время, разносим их по времени
+    created = list(Post.objects.filter(
+        author_id__in=user_ids
+    ).order_by("pk").only("pk"))
+    start = timezone.now() - timedelta(minutes=len(created))
+    for i, post in enumerate(created):
+        post.pub_date = start + timedelta(minutes=i)
+    Post.objects.bulk_update(created, ["pub_date"], batch_size=BATCH_SIZE)
+    post_ids = [post.pk for post in created]
+    Comment.objects.bulk_create(
+        [Comment(post_id=rng.choice(post_ids),
+                 author_id=rng.choice(user_ids),
+                 text=sentence(rng, 6))
+         for _ in range(comments)],
+        batch_size=BATCH_SIZE
+    )
+    edges = {
+        (rng.choice(user_ids), rng.choice(user_ids))
+        for _ in range(follows)
+    }
+    edges = [(user, author) for user, author in edges if user != author]
+    Follow.objects.bulk_create(
+        [Follow(user_id=user, author_id=author) for user, author in edges],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    # bulk_create не шлёт сигналы: счётчики и ленты заполняем сами
+    UserStats.objects.recount(User.objects.filter(pk__in=user_ids))
+    Post.objects.filter(pk__in=post_ids).recount_comments()
+    for user, author in edges:
+        timeline.backfill(user, author)
+    if search.available():
+        search.rebuild()
+
+    usernames = dict(User.objects.filter(pk__in=user_ids).values_list(
+        "pk", "username"
+    ))
+    return {
+        "users": [usernames[pk] for pk in user_ids],
+        "groups": list(Group.objects.filter(pk__in=group_ids).values_list(
+            "slug", flat=True
+        )),
+        "posts": [
+            (("username", usernames[post.author_id]), ("post_id", post.pk))
+            for post in Post.objects.filter(pk__in=post_ids).only(
+                "pk", "author_id"
+            )
+        ],
+        "own": [
+            (("username", usernames[user_ids[0]]), ("post_id", pk))
+            for pk in Post.objects.filter(
+                author_id=user_ids[0]
+            ).values_list("pk", flat=True)
+        ],
+    }
+
+
+def percentile(values, p):
+    # Ранговый перцентиль: значение, не превышаемое p% замеров
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def measure(client, urls, data=None):
+    timings, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for url in urls:
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            try:
+                if data is None:
+                    status = client.get(url).status_code
+                else:
+                    status = client.post(url, data).status_code
+            except Exception:
+                # Тестовый клиент пробрасывает исключения из вьюх
+                status = 500
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+        if status >= 400:
+            errors += 1
+    total = time.perf_counter() - started
+    result = {
+        "requests": len(urls),
+        "errors": errors,
+        "mean_ms": sum(timings) / len(timings),
+        "queries": sum(queries) / len(queries),
+        "max_queries": max(queries),
+        "rps": len(urls) / total if total else 0,
+    }
+    for p in PERCENTILES:
+        result["p{}_ms".format(p)] = percentile(timings, p)
+    return result
+
+
+def run(data, requests=100, seed=0, routes=None):
+    rng = random.Random(seed)
+    guest = Client()
+    reader = Client()
+    results = {}
+    with isolated_caches():
+        reader.force_login(User.objects.get(username=data["users"][0]))
+        for name in routes or ROUTES:
+            login_required, make_kwargs = ROUTES[name]
+            query_string = QUERY_STRINGS.get(name, lambda rng: "")
+            urls = [
+                reverse(name, kwargs=make_kwargs(data, rng))
+                + query_string(rng)
+                for _ in range(requests)
+            ]
+            results[name] = measure(
+                reader if login_required else guest,
+                urls,
+                COMMENT if name == "add_comment" else None
+            )
+    return results
+
+
+def report(results, scale):
+    return {
+        "meta": {
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "scale": scale,
+        },
+        "routes": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """Возвращает список регрессий относительно сохранённого прогона:
+    p95 выросла больше чем на threshold или стало больше запросов."""
+    regressions = []
+    for name, result in current["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append("{}: p95 {:.1f} -> {:.1f} мс".format(
+                name, before["p95_ms"], result["p95_ms"]
+            ))
+        if result["queries"] > before["queries"]:
+            regressions.append("{}: запросов {:.1f} -> {:.1f}".format(
+                name, before["queries"], result["queries"]
+            ))
+    return regressions
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def save(path, data):
+    with open(path, "w") as target:
+        json.dump(data, target, ensure_ascii=False, indent=2)
+
+
+def icontains_page(word):
+    return list(Post.objects.for_feed().filter(
+        Q(text__icontains=word) | Q(comments__text__icontains=word)
+    ).distinct().order_by("-pub_date", "-id")[:PAGINATOR_PAGE_SIZE])
+
+
+def fts_page(word):
+    return list(search.SearchPaginator(word, PAGINATOR_PAGE_SIZE).page(None))
+
+
+def compare_search(requests=100, seed=0):
+    """Первая страница поиска по случайным словам: FTS5 против
+    LIKE-сканирования постов и комментариев."""
+    rng = random.Random(seed)
+    words = [rng.choice(SEARCH_WORDS) for _ in range(requests)]
+    results = {}
+    for name, find in (("fts", fts_page), ("icontains", icontains_page)):
+        timings = []
+        for word in words:
+            start = time.perf_counter()
+            find(word)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            "requests": len(words),
+            "mean_ms": sum(timings) / len(timings),
+        }
+        for p in PERCENTILES:
+            results[name]["p{}_ms".format(p)] = percentile(timings, p)
+    return results
+
+
+def read_step(rng, post_ids):
+    """Чтение, как на главной и странице поста."""
+    list(Post.objects.for_feed()[:PAGINATOR_PAGE_SIZE])
+    post = Post.objects.select_related("author").get(pk=rng.choice(post_ids))
+    list(post.comments.select_related("author"))
+
+
+def write_step(rng, post_ids, user_ids):
+    """Запись, как при публикации поста и комментария: с сигналами,
+    счётчиками и индексом."""
+    with transaction.atomic():
+        post = Post.objects.create(text=sentence(rng),
+                                   author_id=rng.choice(user_ids))
+    with transaction.atomic():
+        Comment.objects.create(post_id=rng.choice(post_ids),
+                               author_id=rng.choice(user_ids),
+                               text=sentence(rng, 6))
+    return post.pk
+
+
+def contend(readers=4, writers=2, duration=5.0, seed=0):
+    """Читатели и писатели одновременно работают с таблицами постов
+    duration секунд. Каждый шаг - как отдельный запрос: после него
+    соединение закрывается, если CONN_MAX_AGE этого не запрещает."""
+    post_ids = list(Post.objects.values_list("pk", flat=True))
+    user_ids = list(User.objects.values_list("pk", flat=True))
+    timings = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(kind, number):
+        rng = random.Random(seed * 1000 + number)
+        own, failed = [], 0
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    if kind == "read":
+                        read_step(rng, post_ids)
+                    else:
+                        write_step(rng, post_ids, user_ids)
+                except OperationalError:
+                    # database is locked: не дождались блокировки
+                    failed += 1
+                own.append((time.perf_counter() - start) * 1000)
+                close_old_connections()
+        finally:
+            connection.close()
+        with lock:
+            timings[kind].extend(own)
+            errors[kind] += failed
+
+    threads = [
+        threading.Thread(target=worker, args=(kind, number))
+        for number, kind in enumerate(["read"] * readers + ["write"] * writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results = {}
+    for kind, values in timings.items():
+        if not values:
+            continue
+        results[kind] = {
+            "operations": len(values),
+            "errors": errors[kind],
+            "ops": len(values) / duration,
+        }
+        for p in PERCENTILES:
+            results[kind]["p{}_ms".format(p)] = percentile(values, p)
+    return results
+
+
+def compare_sqlite(profiles, readers=4, writers=2, duration=5.0, scale=None):
+    """Прогоняет contend на файловой базе для каждого профиля SQLite
+    из settings.SQLITE_PROFILES. База каждый раз новая: режим журнала
+    сохраняется в файле. scale - аргументы seed."""
+    scale = scale or {}
+    results = {}
+    for name in profiles:
+        profile = settings.SQLITE_PROFILES[name]
+        old_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        connection.settings_dict["CONN_MAX_AGE"] = profile["CONN_MAX_AGE"]
+        path = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+        try:
+            with override_settings(SQLITE_PRAGMAS=profile["PRAGMAS"]), \
+                    isolated_database(path):
+                connection.close()
+                seed(**scale)
+                results[name] = contend(readers, writers, duration,
+                                        scale.get("seed", 0))
+        finally:
+            connection.settings_dict["CONN_MAX_AGE"] = old_max_age
+            shutil.rmtree(os.path.dirname(path))
+    return results
+
+
+# Лента из PAGINATOR_PAGE_SIZE карточек: как в index.html, но без
+# кеша фрагментов и окружения страницы
+CARD_TEMPLATES = {
+    "include": ('{% for post in posts %}'
+                '{% include "post_item.html" with post=post %}'
+                '{% endfor %}'),
+    "post_card": ('{% load post_card %}{% for post in posts %}'
+                  '{% post_card post %}{% endfor %}'),
+}
+
+
+def template_backend(profile):
+    """Бэкенд DjangoTemplates с настройками из TEMPLATES и профилем
+    из TEMPLATE_PROFILES."""
+    params = dict(settings.TEMPLATES[0], NAME="benchmark")
+    params.pop("BACKEND")
+    params["OPTIONS"] = dict(params["OPTIONS"])
+    params["OPTIONS"].pop("loaders", None)
+    params["OPTIONS"].pop("debug", None)
+    params["APP_DIRS"] = settings.TEMPLATE_PROFILES[profile]["APP_DIRS"]
+    params["OPTIONS"].update(settings.TEMPLATE_PROFILES[profile]["OPTIONS"])
+    return DjangoTemplates(params)
+
+
+def compare_templates(requests=200):
+    """Время рендера страницы карточек для каждого профиля шаблонов
+    и способа вывода карточки. post_item.html для include берёт
+    загрузчик профиля, как при рендере страницы во вьюхе."""
+    posts = list(Post.objects.for_feed()[:PAGINATOR_PAGE_SIZE])
+    results = {}
+    for profile in settings.TEMPLATE_PROFILES:
+        backend = template_backend(profile)
+        for card, code in CARD_TEMPLATES.items():
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                backend.from_string(code).render({"posts": posts})
+                timings.append((time.perf_counter() - start) * 1000)
+            result = {
+                "requests": requests,
+                "posts": len(posts),
+                "mean_ms": sum(timings) / len(timings),
+            }
+            for p in PERCENTILES:
+                result["p{}_ms".format(p)] = percentile(timings, p)
+            results["{}/{}".format(profile, card)] = result
+    return results
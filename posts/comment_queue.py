@@ -0,0 +1,260 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import suppress
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, trending
+from .feed_cache import bump_feed_version, bump_scopes, post_scopes
+from .models import Comment, Post, User
+from .settings import (COMMENT_BATCH_SIZE, COMMENT_FLUSH_INTERVAL,
+                       COMMENT_HOT_THRESHOLD, COMMENT_PENDING_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+# Меняется с каждым комментарием автора в очереди и входит в ETag,
+# чтобы автору не вернули 304 со страницей без его комментария
+PENDING_COOKIE = "yatube_pending"
+RATE_WINDOW = 60
+# Файл на выгрузке дольше этого срока остался от упавшего процесса
+STALE_SECONDS = 60
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def spool_path():
+    # У каждого процесса свой файл, запись в него не ждёт других
+    return os.path.join(settings.COMMENT_SPOOL_DIR,
+                        "comments-{}.jsonl".format(os.getpid()))
+
+
+def pending_key(post_id, user_id):
+    return "comments:pending:{}:{}".format(post_id, user_id)
+
+
+def is_hot(post_id):
+    key = "comments:rate:{}:{}".format(post_id,
+                                       int(time.time() // RATE_WINDOW))
+    cache.add(key, 0, RATE_WINDOW * 2)
+    try:
+        return cache.incr(key) > COMMENT_HOT_THRESHOLD
+    except ValueError:
+        return False
+
+
+def append(entry):
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    os.makedirs(settings.COMMENT_SPOOL_DIR, exist_ok=True)
+    path = spool_path()
+    while True:
+        with open(path, "a", encoding="utf-8") as spool:
+            fcntl.flock(spool, fcntl.LOCK_EX)
+            # Пока ждали блокировку, файл могли забрать на выгрузку
+            try:
+                current = os.stat(path).st_ino == os.fstat(
+                    spool.fileno()
+                ).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                spool.write(line)
+                return
+
+
+def enqueue(post_id, user, text):
+    """Ставит комментарий в очередь без обращения к базе. Автор видит
+    его на странице поста сразу, остальные - после выгрузки."""
+    entry = {
+        "token": uuid.uuid4().hex,
+        "post": int(post_id),
+        "author": user.pk,
+        "text": text,
+        "created": timezone.now().isoformat(),
+    }
+    append(entry)
+    key = pending_key(entry["post"], user.pk)
+    cache.set(key, (cache.get(key) or []) + [entry],
+              COMMENT_PENDING_TIMEOUT)
+    start_flusher()
+    return entry
+
+
+def pending(post_id, user):
+    """Комментарии автора из очереди, которых ещё нет в базе."""
+    if not user.is_authenticated:
+        return []
+    entries = cache.get(pending_key(post_id, user.pk))
+    if not entries:
+        return []
+    tokens = [uuid.UUID(entry["token"]) for entry in entries]
+    # Записанный комментарий может быть уже не на первой странице ветки
+    flushed = set(Comment.objects.filter(
+        queue_token__in=tokens
+    ).values_list("queue_token", flat=True))
+    result = []
+    for entry, token in zip(entries, tokens):
+        if token not in flushed:
+            result.append(Comment(
+                post_id=post_id, author=user, text=entry["text"],
+                created=parse_datetime(entry["created"]), queue_token=token
+            ))
+    return result
+
+
+def claim():
+    """Забирает файлы очереди на выгрузку переименованием: писатели
+    после этого начинают новый файл, а два выгрузчика не получат один
+    и тот же."""
+    try:
+        names = sorted(os.listdir(settings.COMMENT_SPOOL_DIR))
+    except FileNotFoundError:
+        return []
+    claimed = []
+    for name in names:
+        path = os.path.join(settings.COMMENT_SPOOL_DIR, name)
+        try:
+            if name.endswith(".flushing") and (
+                time.time() - os.path.getmtime(path) < STALE_SECONDS
+            ):
+                continue
+            if not name.endswith((".jsonl", ".flushing")):
+                continue
+            target = os.path.join(
+                settings.COMMENT_SPOOL_DIR,
+                "{}.{}.flushing".format(name.split(".", 1)[0],
+                                        uuid.uuid4().hex)
+            )
+            os.rename(path, target)
+            # rename сохраняет mtime: давно не дописанный файл иначе
+            # сразу выглядел бы брошенным, и его забрал бы другой
+            os.utime(target)
+        except FileNotFoundError:
+            continue
+        claimed.append(target)
+    return claimed
+
+
+def read(path):
+    entries = []
+    with open(path, encoding="utf-8") as spool:
+        # Дожидаемся писателей, открывших файл до переименования
+        fcntl.flock(spool, fcntl.LOCK_EX)
+        for number, line in enumerate(spool, 1):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.error("%s:%s: испорченная запись очереди",
+                             path, number)
+    return entries
+
+
+def write(entries):
+    tokens = [uuid.UUID(entry["token"]) for entry in entries]
+    post_ids = set(Post.objects.filter(
+        pk__in={entry["post"] for entry in entries}
+    ).values_list("pk", flat=True))
+    author_ids = set(User.objects.filter(
+        pk__in={entry["author"] for entry in entries}
+    ).values_list("pk", flat=True))
+    token_field = Comment._meta.get_field("queue_token")
+    with transaction.atomic():
+        # Файл мог остаться после сбоя уже записанным или выгружаться
+        # параллельно другим процессом
+        existing = set(Comment.objects.filter(
+            queue_token__in=tokens
+        ).values_list("queue_token", flat=True))
+        comments = {}
+        for entry, token in zip(entries, tokens):
+            # Запись могла попасть в файл дважды
+            if (token in existing or token in comments
+                    or entry["post"] not in post_ids
+                    or entry["author"] not in author_ids):
+                continue
+            comments[token] = (entry, Comment(
+                post_id=entry["post"], author_id=entry["author"],
+                text=entry["text"], queue_token=token
+            ))
+        if not comments:
+            return 0
+        Comment.objects.bulk_create(
+            [comment for _, comment in comments.values()],
+            ignore_conflicts=True
+        )
+        # ignore_conflicts молча пропускает строки: считаем только то,
+        # что действительно оказалось в таблице
+        inserted = list(Comment.objects.filter(
+            queue_token__in=list(comments)
+        ).values_list("queue_token", "pk", "post_id"))
+        # auto_now_add ставит время выгрузки, возвращаем время из записи
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "UPDATE {} SET created = %s WHERE queue_token = %s".format(
+                    Comment._meta.db_table
+                ),
+                [(connection.ops.adapt_datetimefield_value(
+                    parse_datetime(comments[token][0]["created"])
+                ), token_field.get_db_prep_value(token, connection))
+                 for token, _, _ in inserted]
+            )
+        # bulk_create не шлёт сигналов: счётчики, поисковый индекс
+        # и версию лент обновляем сами, по разу на пост
+        counts = Counter(post_id for _, _, post_id in inserted)
+        for post_id, count in counts.items():
+            Post.objects.filter(pk=post_id).update(
+                comment_count=F("comment_count") + count
+            )
+        search.index_comments(pk for _, pk, _ in inserted)
+    for post_id, count in counts.items():
+        trending.record_comments(post_id, count)
+    if counts:
+        bump_feed_version()
+        bump_scopes(post_scopes(counts))
+    return len(inserted)
+
+
+def flush():
+    """Переносит очередь в базу и возвращает число новых комментариев."""
+    written = 0
+    for path in claim():
+        entries = read(path)
+        for start in range(0, len(entries), COMMENT_BATCH_SIZE):
+            written += write(entries[start:start + COMMENT_BATCH_SIZE])
+        # Файл, оставшийся от упавшего процесса, мог удалить другой
+        # выгрузчик
+        with suppress(FileNotFoundError):
+            os.remove(path)
+    return written
+
+
+def run():
+    while True:
+        time.sleep(COMMENT_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Не удалось выгрузить очередь комментариев")
+        finally:
+            connection.close()
+
+
+def start_flusher():
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            # Очередь, оставшуюся от завершённого процесса, подхватит
+            # выгрузчик любого другого или команда flush_comments
+            _flusher = threading.Thread(target=run, name="comments",
+                                        daemon=True)
+            _flusher.start()
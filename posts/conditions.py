@@ -0,0 +1,41 @@
+import hashlib
+
+from django.conf import settings
+
+from .comment_queue import PENDING_COOKIE
+from .feed_cache import scope_versions
+
+
+def make_etag(request, scopes):
+    # Страница зависит от версий своих областей: запись в другую группу
+    # или под другой пост её ETag не меняет. Для пользователя добавляется
+    # его область - подписки меняют кнопки на всех страницах. Комментарии
+    # из очереди версий не меняют, их автора отличает кука, а токен
+    # CSRF в формах меняется при входе
+    user = request.user.pk if request.user.is_authenticated else ""
+    if user:
+        scopes = list(scopes) + ["user:{}".format(user)]
+    parts = [request.get_full_path(), user]
+    parts += scope_versions(scopes)
+    parts += [request.COOKIES.get(PENDING_COOKIE, ""),
+              request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")]
+    raw = "|".join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request, *args, **kwargs):
+    return make_etag(request, ["index"])
+
+
+def group_etag(request, slug, *args, **kwargs):
+    return make_etag(request, ["group:" + slug, "trending"])
+
+
+def profile_etag(request, username, *args, **kwargs):
+    return make_etag(request, ["profile:" + username, "suggestions"])
+
+
+def post_etag(request, username, post_id, *args, **kwargs):
+    # В карточке автора на странице поста - его счётчики
+    return make_etag(request, ["post:{}".format(post_id),
+                               "profile:" + username])
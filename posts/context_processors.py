@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from .feed_cache import feed_version
+from .settings import FEED_CACHE_TIMEOUT
+
+
+def feed_cache(request):
+    return {
+        "feed_version": SimpleLazyObject(feed_version),
+        "feed_cache_timeout": FEED_CACHE_TIMEOUT,
+    }
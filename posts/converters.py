@@ -0,0 +1,8 @@
+class FeedFormatConverter:
+    regex = "rss|atom|json"
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
@@ -0,0 +1,65 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Post
+
+VERSION_KEY = "posts:feed_version"
+
+
+def feed_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Начинаем с метки времени, а не с 1: после вытеснения ключа
+        # старые фрагменты с маленькой версией не оживут
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        return feed_version()
+
+
+# Версии областей для ETag: страница сравнивает только версии тех
+# областей, которые показывает, - ленты, группы, профиля, поста
+def scope_key(scope):
+    return "posts:version:" + scope
+
+
+def scope_versions(scopes):
+    keys = [scope_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def bump_scopes(scopes):
+    for key in map(scope_key, scopes):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Версии нет - при чтении она начнётся с текущего времени
+            pass
+
+
+def post_scopes(post_ids):
+    """Области, где видны посты: общая лента, их страницы, профили
+    авторов и группы."""
+    scopes = {"index"}
+    for pk in post_ids:
+        scopes.add("post:{}".format(pk))
+    for username, slug in Post.objects.filter(pk__in=post_ids).order_by(
+    ).values_list("author__username", "group__slug"):
+        scopes.add("profile:" + username)
+        if slug:
+            scopes.add("group:" + slug)
+    return scopes
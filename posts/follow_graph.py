@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db import IntegrityError, router, transaction
+
+from .models import Follow
+from .settings import FOLLOWING_CACHE_TIMEOUT
+
+
+def following_key(user_id):
+    return "follow:following:{}".format(user_id)
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь."""
+    key = following_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        # Из primary: множество с отстающей реплики легло бы в кеш
+        # на весь таймаут
+        ids = frozenset(Follow.objects.using(
+            router.db_for_write(Follow)
+        ).filter(user_id=user_id).values_list("author_id", flat=True))
+        cache.set(key, ids, FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def forget(user_id):
+    cache.delete(following_key(user_id))
+
+
+def follow_states(viewer, author_ids):
+    """Подписан ли viewer на каждого из авторов: для страницы постов
+    один запрос к базе, если множества нет в кеше, иначе ни одного."""
+    if not (viewer.is_authenticated and author_ids):
+        return dict.fromkeys(author_ids, False)
+    ids = following_ids(viewer.pk)
+    return {author_id: author_id in ids for author_id in author_ids}
+
+
+def is_following(viewer, author):
+    return follow_states(viewer, [author.pk])[author.pk]
+
+
+def follow(user, author):
+    """Подписка одним INSERT: повтор или параллельный запрос упираются
+    в unique_following и ничего не меняют. True, если подписка новая."""
+    if user.pk == author.pk:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Создаёт миниатюры для уже загруженных картинок постов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Пересоздать миниатюры и для постов, где они уже есть"
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image=None)
+        if not options["all"]:
+            posts = posts.filter(image_thumb="")
+        post_ids = list(posts.values_list("pk", flat=True))
+        results = thumbnails.get_executor().map(thumbnails.run, post_ids)
+        failed = [pk for pk, ok in zip(post_ids, results) if not ok]
+        for post_id in failed:
+            self.stderr.write("Пост {}: ошибка, см. лог".format(post_id))
+        self.stdout.write(self.style.SUCCESS(
+            "Готово: {}, ошибок: {}".format(
+                len(post_ids) - len(failed), len(failed)
+            )
+        ))
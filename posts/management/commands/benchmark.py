@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Заполняет отдельную тестовую базу синтетическими данными "
+            "и замеряет все страницы posts и users")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--groups", type=int, default=5)
+        parser.add_argument("--posts", type=int, default=1000)
+        parser.add_argument("--comments", type=int, default=2000)
+        parser.add_argument("--follows", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=100,
+                            help="Запросов на каждый маршрут")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--route", action="append", dest="routes",
+                            choices=sorted(benchmark.ROUTES))
+        parser.add_argument("--output", help="Куда сохранить JSON")
+        parser.add_argument("--baseline",
+                            help="JSON прошлого прогона для сравнения")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Допустимый рост p95, доля")
+
+    def handle(self, *args, **options):
+        scale = {
+            name: options[name]
+            for name in ("users", "groups", "posts", "comments", "follows",
+                         "requests", "seed")
+        }
+        with benchmark.isolated_database():
+            data = benchmark.seed(
+                users=options["users"],
+                groups=options["groups"],
+                posts=options["posts"],
+                comments=options["comments"],
+                follows=options["follows"],
+                seed=options["seed"]
+            )
+            results = benchmark.run(data, options["requests"],
+                                    options["seed"], options["routes"])
+
+        current = benchmark.report(results, scale)
+        self.stdout.write("{:<18}{:>9}{:>9}{:>9}{:>9}{:>8}{:>7}".format(
+            "маршрут", "p50", "p95", "p99", "rps", "sql", "err"
+        ))
+        for name, result in results.items():
+            self.stdout.write(
+                "{:<18}{p50_ms:>9.1f}{p95_ms:>9.1f}{p99_ms:>9.1f}"
+                "{rps:>9.1f}{queries:>8.1f}{errors:>7}".format(name, **result)
+            )
+        if options["output"]:
+            benchmark.save(options["output"], current)
+        if options["baseline"]:
+            regressions = benchmark.compare(
+                current,
+                benchmark.load(options["baseline"]),
+                options["threshold"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Регрессии:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Регрессий нет"))
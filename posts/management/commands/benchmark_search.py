@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark, search
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает поиск по полнотекстовому индексу с icontains "
+            "на синтетических данных в отдельной тестовой базе")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=20000)
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError("Полнотекстовый индекс есть только в SQLite")
+        with benchmark.isolated_database():
+            benchmark.seed(posts=options["posts"],
+                           comments=options["comments"],
+                           seed=options["seed"])
+            results = benchmark.compare_search(options["requests"],
+                                               options["seed"])
+        self.stdout.write("{:<12}{:>9}{:>9}{:>9}{:>9}".format(
+            "поиск", "mean", "p50", "p95", "p99"
+        ))
+        for name, result in results.items():
+            self.stdout.write(
+                "{:<12}{mean_ms:>9.1f}{p50_ms:>9.1f}{p95_ms:>9.1f}"
+                "{p99_ms:>9.1f}".format(name, **result)
+            )
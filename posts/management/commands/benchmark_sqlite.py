@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Одновременные читатели и писатели на файловой базе SQLite: "
+            "сравнение профилей настроек из SQLITE_PROFILES")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=2000)
+        parser.add_argument("--comments", type=int, default=4000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--profile", action="append", dest="profiles",
+                            choices=sorted(settings.SQLITE_PROFILES))
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Бенчмарк настроек SQLite")
+        scale = {
+            name: options[name]
+            for name in ("users", "posts", "comments", "seed")
+        }
+        results = benchmark.compare_sqlite(
+            options["profiles"] or sorted(settings.SQLITE_PROFILES),
+            options["readers"],
+            options["writers"],
+            options["seconds"],
+            scale
+        )
+        self.stdout.write("{:<14}{:<7}{:>8}{:>9}{:>9}{:>9}{:>7}".format(
+            "профиль", "", "оп/с", "p50", "p95", "p99", "err"
+        ))
+        for name, kinds in results.items():
+            for kind, result in kinds.items():
+                self.stdout.write(
+                    "{:<14}{:<7}{ops:>8.1f}{p50_ms:>9.1f}{p95_ms:>9.1f}"
+                    "{p99_ms:>9.1f}{errors:>7}".format(name, kind, **result)
+                )
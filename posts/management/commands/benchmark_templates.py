@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Время рендера страницы из десяти карточек постов: include "
+            "post_item.html против тега post_card, без кеша загрузчика "
+            "и с ним")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with benchmark.isolated_database():
+            benchmark.seed(users=10, groups=3, posts=100, comments=200,
+                           follows=0, seed=options["seed"])
+            results = benchmark.compare_templates(options["requests"])
+        self.stdout.write("{:<22}{:>9}{:>9}{:>9}{:>9}".format(
+            "профиль/карточка", "mean", "p50", "p95", "p99"
+        ))
+        for name, result in results.items():
+            self.stdout.write(
+                "{:<22}{mean_ms:>9.2f}{p50_ms:>9.2f}{p95_ms:>9.2f}"
+                "{p99_ms:>9.2f}".format(name, **result)
+            )
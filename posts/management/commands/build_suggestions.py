@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+from posts.settings import SUGGESTIONS_BATCH_SIZE, SUGGESTIONS_TOP_K
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает рекомендации «кого почитать» по графу подписок. "
+            "С --stale - только для пользователей, чьи подписки изменились")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stale", action="store_true")
+        parser.add_argument("--top", type=int, default=SUGGESTIONS_TOP_K)
+        parser.add_argument("--batch-size", type=int,
+                            default=SUGGESTIONS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = suggestions.build(k=options["top"],
+                                  batch_size=options["batch_size"],
+                                  stale=options["stale"])
+        self.stdout.write(self.style.SUCCESS(
+            "Пересчитано пользователей: {} ({:.1f} с)".format(
+                count, time.perf_counter() - started
+            )
+        ))
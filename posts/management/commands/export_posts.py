@@ -0,0 +1,31 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = "Выгружает посты в JSONL или CSV, не загружая их в память"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл или - для stdout")
+        parser.add_argument("--format", choices=transfer.FORMATS)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or transfer.guess_format(path)
+        rows = transfer.export_rows(options["chunk_size"])
+        started = time.perf_counter()
+        if path == "-":
+            count = transfer.write_rows(sys.stdout, fmt, rows)
+        else:
+            with open(path, "w", encoding="utf-8", newline="") as stream:
+                count = transfer.write_rows(stream, fmt, rows)
+        elapsed = time.perf_counter() - started
+        # В stdout могут идти сами данные, отчёт пишем в stderr
+        self.stderr.write("Выгружено постов: {} ({:.0f} в секунду)".format(
+            count, count / elapsed if elapsed else 0
+        ))
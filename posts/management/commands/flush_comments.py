@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = ("Переносит очередь комментариев горячих постов в базу, "
+            "например после остановки сервера")
+
+    def handle(self, *args, **options):
+        written = comment_queue.flush()
+        self.stdout.write(self.style.SUCCESS(
+            "Записано комментариев: {}".format(written)
+        ))
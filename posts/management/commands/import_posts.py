@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ("Загружает посты из JSONL или CSV пачками через bulk_create. "
+            "Авторы ищутся по username, группы по slug")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл или - для stdin")
+        parser.add_argument("--format", choices=transfer.FORMATS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--create-missing", action="store_true",
+                            help="Создавать неизвестных авторов и группы")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        path = options["path"]
+        fmt = options["format"] or transfer.guess_format(path)
+        importer = transfer.Importer(options["batch_size"],
+                                     options["create_missing"])
+        try:
+            if path == "-":
+                importer.run(transfer.read_rows(sys.stdin, fmt),
+                             self.progress)
+            else:
+                with open(path, encoding="utf-8", newline="") as stream:
+                    importer.run(transfer.read_rows(stream, fmt),
+                                 self.progress)
+        except ValueError as error:
+            raise CommandError(
+                "Импорт остановлен после {} постов: {}".format(
+                    importer.imported, error
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Загружено постов: {}, пропущено: {} ({:.0f} в секунду)".format(
+                importer.imported, importer.skipped, importer.rate
+            )
+        ))
+
+    def progress(self, importer):
+        if self.verbosity > 1:
+            self.stdout.write("{} постов, {:.0f} в секунду".format(
+                importer.imported, importer.rate
+            ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post, User, UserStats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные счётчики пользователей и постов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        user_ids = list(User.objects.order_by("pk").values_list(
+            "pk", flat=True
+        ))
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            with transaction.atomic():
+                UserStats.objects.recount(User.objects.filter(pk__in=batch))
+        with transaction.atomic():
+            posts = Post.objects.recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            "Пересчитано пользователей: {}, постов: {}".format(
+                len(user_ids), posts
+            )
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает списки популярных постов и групп по почасовым "
+            "корзинам, например после очистки кеша")
+
+    def handle(self, *args, **options):
+        lists = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            "Популярных постов: {}, групп: {}".format(
+                len(lists[trending.POSTS_KEY]),
+                len(lists[trending.GROUPS_KEY])
+            )
+        ))
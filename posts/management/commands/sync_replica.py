@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ("Копирует базу default в реплики SQLite: локальная замена "
+            "репликации для профиля YATUBE_DATABASE=replica")
+
+    def handle(self, *args, **options):
+        primary = connections["default"]
+        if primary.vendor != "sqlite":
+            raise CommandError("Реплики настраиваются средствами СУБД")
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("Реплики не настроены, см. YATUBE_DATABASE")
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.close()
+            # backup копирует согласованный снимок, даже если в primary
+            # в это время пишут
+            target = sqlite3.connect(replica.settings_dict["NAME"])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(
+                "Реплика {} обновлена".format(alias)
+            ))
@@ -0,0 +1,61 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef("pk")}).order_by().values(
+            field
+        ).annotate(total=Count("pk")).values("total"),
+        output_field=IntegerField()
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model("posts", "Post")
+    Comment = apps.get_model("posts", "Comment")
+    Follow = apps.get_model("posts", "Follow")
+    UserStats = apps.get_model("posts", "UserStats")
+    Post.objects.update(comment_count=count_subquery(Comment, "post"))
+    users = User.objects.annotate(
+        followers=count_subquery(Follow, "author"),
+        followings=count_subquery(Follow, "user"),
+        posts_total=count_subquery(Post, "author"),
+    ).values_list("pk", "followers", "followings", "posts_total")
+    UserStats.objects.bulk_create([
+        UserStats(user_id=pk, followers_count=followers,
+                  following_count=followings, posts_count=posts_total)
+        for pk, followers, followings, posts_total in users.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
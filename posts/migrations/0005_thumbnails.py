@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_preview',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_thumb',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
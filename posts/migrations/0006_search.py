@@ -0,0 +1,59 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE posts_search USING fts5("
+        "text, comments, post_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Совпадение в тексте поста весит вдвое больше, чем в комментариях
+    schema_editor.execute(
+        "INSERT INTO posts_search (posts_search, rank) "
+        "VALUES ('rank', 'bm25(2.0, 1.0)')"
+    )
+    schema_editor.execute(
+        "INSERT INTO posts_search (rowid, text, comments, post_id) "
+        "SELECT id, text, '', id FROM posts_post"
+    )
+    schema_editor.execute(
+        "INSERT INTO posts_search (rowid, text, comments, post_id) "
+        "SELECT -id, '', text, post_id FROM posts_comment"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS posts_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.IntegerField(db_column='rowid', primary_key=True, serialize=False)),
+                ('post', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='search_documents', to='posts.Post')),
+                ('text', models.TextField()),
+                ('comments', models.TextField()),
+                ('query', posts.models.SearchQueryField(db_column='posts_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
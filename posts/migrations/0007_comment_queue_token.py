@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='queue_token',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
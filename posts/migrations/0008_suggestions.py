@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_comment_queue_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='suggestions_graph',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='Suggestion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='suggestion',
+            index=models.Index(fields=['user', '-score', 'author'], name='suggestion_user_score'),
+        ),
+        migrations.AddConstraint(
+            model_name='suggestion',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_suggestion'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postactivity',
+            index=models.Index(fields=['hour'], name='post_activity_hour'),
+        ),
+        migrations.AddConstraint(
+            model_name='postactivity',
+            constraint=models.UniqueConstraint(fields=('post', 'hour'), name='unique_post_activity'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,9 +1,30 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models import (Count, F, IntegerField, Lookup, OuterRef,
+                              Subquery)
+from django.db.models.functions import Coalesce, Greatest
 
 User = get_user_model()
 
 
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef("pk")}).order_by().values(
+            field
+        ).annotate(total=Count("pk")).values("total"),
+        output_field=IntegerField()
+    ), 0)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related("author", "group")
+
+    def recount_comments(self):
+        return self.update(comment_count=count_subquery(Comment, "post"))
+
+
 class Post(models.Model):
     text = models.TextField(
                     verbose_name="Текст поста",
@@ -22,14 +43,43 @@ class Post(models.Model):
         null=True,
         verbose_name="Изображение",
     )
+    image_thumb = models.CharField(max_length=255, blank=True,
+                                   editable=False)
+    image_preview = models.CharField(max_length=255, blank=True,
+                                     editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Пишется пачками, см. posts.trending
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_id'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_id'),
+        ]
 
     def __str__(self):
 
         return self.text[:15]
 
+    @property
+    def thumb_url(self):
+        if self.image_thumb:
+            return default_storage.url(self.image_thumb)
+        return self.image.url
+
+    @property
+    def preview_url(self):
+        if self.image_preview:
+            return default_storage.url(self.image_preview)
+        return self.image.url
+
 
 class Group(models.Model):
 
@@ -52,6 +102,16 @@ class Comment(models.Model):
                     help_text="Поделитесь своими мыслями с автором"
                     )
     created = models.DateTimeField("date commented", auto_now_add=True)
+    # Метка комментария из очереди: повторная выгрузка того же файла
+    # не создаст дубликатов
+    queue_token = models.UUIDField(null=True, blank=True, unique=True,
+                                   editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_id'),
+        ]
 
     def __str__(self):
         return self.text
@@ -70,3 +130,157 @@ class Follow(models.Model):
                 name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user'),
+        ]
+
+
+class UserStatsManager(models.Manager):
+    def bump(self, user_id, **deltas):
+        # Счётчик мог разойтись с таблицами (bulk_create без сигналов):
+        # не уходим ниже нуля, иначе удаление упрётся в CHECK
+        return self.filter(user_id=user_id).update(**{
+            field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()
+        })
+
+    def recount(self, users=None):
+        if users is None:
+            users = User.objects.all()
+        users = users.annotate(
+            followers=count_subquery(Follow, "author"),
+            followings=count_subquery(Follow, "user"),
+            posts_total=count_subquery(Post, "author"),
+        ).values_list("pk", "followers", "followings", "posts_total")
+        stats = [
+            UserStats(user_id=pk, followers_count=followers,
+                      following_count=followings, posts_count=posts_total)
+            for pk, followers, followings, posts_total in users
+        ]
+        self.bulk_create(stats, ignore_conflicts=True)
+        self.bulk_update(
+            stats, ["followers_count", "following_count", "posts_count"]
+        )
+        return stats
+
+    def get_for(self, user):
+        try:
+            return user.stats
+        except UserStats.DoesNotExist:
+            return self.recount(User.objects.filter(pk=user.pk))[0]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+    # Отпечаток подписок на момент расчёта рекомендаций, см.
+    # posts.suggestions.stale_users
+    suggestions_graph = models.BigIntegerField(null=True, editable=False)
+
+    objects = UserStatsManager()
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_post'),
+        ]
+
+
+class Suggestion(models.Model):
+    """Рекомендация «кого почитать», см. posts.suggestions."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="suggestions")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score', 'author'],
+                         name='suggestion_user_score'),
+        ]
+
+
+class PostActivity(models.Model):
+    """Комментарии и просмотры поста за час, см. posts.trending."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="+")
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL,
+                              related_name="+", blank=True, null=True)
+    hour = models.DateTimeField()
+    comments = models.PositiveIntegerField(default=0)
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'hour'],
+                name='unique_post_activity'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='post_activity_hour'),
+        ]
+
+
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return "{} MATCH {}".format(lhs, rhs), lhs_params + rhs_params
+
+
+class SearchQueryField(models.TextField):
+    """Скрытый столбец FTS5 с именем таблицы: `posts_search MATCH`
+    ищет по всем столбцам сразу."""
+
+
+SearchQueryField.register_lookup(Match)
+
+
+class SearchDocument(models.Model):
+    """Строка полнотекстового индекса: текст поста (rowid - id поста)
+    или одного комментария (rowid - минус id комментария). Таблица -
+    виртуальная FTS5, её создаёт миграция, а заполняет posts.search.
+    """
+    id = models.IntegerField(primary_key=True, db_column="rowid")
+    post = models.ForeignKey(Post, on_delete=models.DO_NOTHING,
+                             db_constraint=False,
+                             related_name="search_documents")
+    text = models.TextField()
+    comments = models.TextField()
+    query = SearchQueryField(db_column="posts_search")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "posts_search"
@@ -0,0 +1,265 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+from .settings import EXACT_COUNT_LIMIT, PAGE_RANGE_LIMIT
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def estimate_count(queryset):
+    """Оценка числа строк неотфильтрованной таблицы без COUNT(*):
+    статистика планировщика в PostgreSQL, иначе максимальный id.
+    Для выборок с условиями оценки нет.
+    """
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+    return queryset.aggregate(last=Max("pk"))["last"]
+
+
+class ApproximatePaginator(Paginator):
+    """Paginator, которому не нужен точный COUNT(*) большой выборки.
+
+    Число записей берётся из `total` (поддерживаемого счётчика), если он
+    передан. Иначе выборка считается не дальше EXACT_COUNT_LIMIT строк:
+    маленькие выборки получают точное число, для больших оно оценивается,
+    а `approximate` становится True. page_range обрезается до
+    PAGE_RANGE_LIMIT страниц.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, total=None):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.total = total
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        if self.total is not None:
+            return self.total
+        counted = self.object_list[:EXACT_COUNT_LIMIT + 1].count()
+        if counted <= EXACT_COUNT_LIMIT:
+            return counted
+        self.approximate = True
+        return max(estimate_count(self.object_list) or 0, counted)
+
+    @property
+    def page_range(self):
+        return range(1, min(self.num_pages, PAGE_RANGE_LIMIT) + 1)
+
+
+class CursorPaginator(ApproximatePaginator):
+    """Keyset-паджинатор: страница выбирается по ключу `ordering`
+    последней показанной записи, без COUNT(*) и OFFSET.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=("-pub_date", "-id"), total=None):
+        super().__init__(object_list.order_by(*ordering), per_page,
+                         total=total)
+        self.ordering = tuple(ordering)
+
+    @property
+    def fields(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    def cursor_values(self, obj):
+        return [
+            self.object_list.model._meta.get_field(name).value_to_string(obj)
+            for name in self.fields
+        ]
+
+    def parse_values(self, values):
+        opts = self.object_list.model._meta
+        return [
+            opts.get_field(name).to_python(value)
+            for name, value in zip(self.fields, values)
+        ]
+
+    def encode_cursor(self, obj, direction):
+        values = self.cursor_values(obj)
+        raw = json.dumps([direction, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            if len(values) != len(self.fields):
+                raise ValueError(values)
+            values = self.parse_values(values)
+        except (binascii.Error, TypeError, ValueError,
+                ValidationError) as error:
+            raise InvalidCursor("Некорректный курсор") from error
+        if any(value is None for value in values):
+            raise InvalidCursor("Некорректный курсор")
+        return direction, values
+
+    def keyset_filter(self, values, backwards=False, ordering=None):
+        ordering = ordering or self.ordering
+        names = [field.lstrip("-") for field in ordering]
+        lookups = [
+            "lt" if field.startswith("-") != backwards else "gt"
+            for field in ordering
+        ]
+        condition = Q()
+        for i, (name, lookup) in enumerate(zip(names, lookups)):
+            step = Q(**{"{}__{}".format(name, lookup): values[i]})
+            for prev_name, prev_value in zip(names[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        # Нестрогое условие на первый ключ SQLite умеет превращать
+        # в диапазон по индексу, OR-цепочку целиком - нет
+        return Q(**{"{}__{}e".format(names[0], lookups[0]): values[0]}) & (
+            condition
+        )
+
+    def paginate_queryset(self, queryset, values, backwards=False,
+                          ordering=None):
+        ordering = ordering or self.ordering
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(values, backwards, ordering)
+            )
+        if backwards:
+            queryset = queryset.reverse()
+        return queryset[:self.per_page + 1]
+
+    def fetch(self, values, backwards):
+        return list(self.paginate_queryset(self.object_list, values,
+                                           backwards))
+
+    def page(self, cursor):
+        if cursor:
+            self.decode_cursor(cursor)
+        return CursorPage(self, cursor or "")
+
+    def get_page(self, cursor):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+
+class CursorPage(Page):
+
+    def __init__(self, paginator, cursor):
+        self.paginator = paginator
+        self.cursor = cursor
+        self.number = None
+
+    def __repr__(self):
+        return "<Page cursor={!r}>".format(self.cursor)
+
+    @cached_property
+    def _window(self):
+        per_page = self.paginator.per_page
+        direction, values = NEXT, None
+        if self.cursor:
+            direction, values = self.paginator.decode_cursor(self.cursor)
+        rows = self.paginator.fetch(values, direction == PREVIOUS)
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            return rows, has_more, True
+        return rows, values is not None, has_more
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    def has_previous(self):
+        return self._window[1]
+
+    def has_next(self):
+        return self._window[2]
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0],
+                                                PREVIOUS)
+        return None
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+        return None
+
+    # Номеров страниц у курсорной выдачи нет: для совместимости с API
+    # Page «номер» соседней страницы - её курсор, а позиция записей
+    # в выборке неизвестна без OFFSET
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CommentPaginator(CursorPaginator):
+    """Ветка комментариев поста, от старых к новым, по индексу
+    (post, created, id).
+
+    Страница - срез QuerySet ровно из per_page записей. Для первой
+    страницы продолжение видно по счётчику comment_count, для остальных
+    оно предполагается, если страница заполнена: на границе последняя
+    ссылка может вести на пустую страницу, зато лишняя строка не нужна.
+    """
+
+    def __init__(self, post, per_page):
+        super().__init__(post.comments.select_related("author"), per_page,
+                         ordering=("created", "id"),
+                         total=post.comment_count)
+
+    def thread(self, cursor=None):
+        """Возвращает комментарии страницы и курсор следующей."""
+        values = None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            if direction != NEXT:
+                raise InvalidCursor("Ветка листается только вперёд")
+        comments = self.object_list
+        if values is not None:
+            comments = comments.filter(self.keyset_filter(values))
+        comments = comments[:self.per_page]
+        shown = len(comments)
+        if values is None:
+            has_next = self.count > shown
+        else:
+            has_next = shown == self.per_page
+        next_cursor = None
+        if has_next and shown:
+            next_cursor = self.encode_cursor(comments[shown - 1], NEXT)
+        return comments, next_cursor
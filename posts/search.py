@@ -0,0 +1,172 @@
+import re
+
+from django.db import connection
+from django.db.models import Min
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post, SearchDocument
+from .paginator import CursorPaginator
+
+# Границы совпадения в сниппете: символы из частной области Unicode,
+# чтобы после экранирования заменить их на <mark>
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+SNIPPET_TOKENS = 24
+
+# Пост и каждый комментарий - отдельные строки индекса: новый
+# комментарий добавляет одну строку, а не переписывает документ поста
+POST_ROWS_SQL = (
+    "INSERT INTO posts_search (rowid, text, comments, post_id) "
+    "SELECT id, text, '', id FROM posts_post"
+)
+COMMENT_ROWS_SQL = (
+    "INSERT INTO posts_search (rowid, text, comments, post_id) "
+    "SELECT -id, '', text, post_id FROM posts_comment"
+)
+
+
+def available():
+    return connection.vendor == "sqlite"
+
+
+def build_query(text):
+    """Переводит пользовательский ввод в запрос FTS5: каждое слово -
+    отдельная фраза с поиском по префиксу, все слова обязательны."""
+    words = re.findall(r"\w+", text.lower())
+    return " ".join('"{}"*'.format(word) for word in words)
+
+
+def index_post(post_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM posts_search WHERE rowid = %s",
+                       [post_id])
+        cursor.execute(POST_ROWS_SQL + " WHERE id = %s", [post_id])
+
+
+def index_since(post_id):
+    """Индексирует посты с id больше данного, например после
+    bulk_create, который не шлёт сигналов."""
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM posts_search WHERE rowid > %s",
+                       [post_id])
+        cursor.execute(POST_ROWS_SQL + " WHERE id > %s", [post_id])
+
+
+def unindex_post(post_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM posts_search WHERE rowid = %s",
+                       [post_id])
+
+
+def index_comments(comment_ids):
+    comment_ids = list(comment_ids)
+    if not (available() and comment_ids):
+        return
+    placeholders = ", ".join(["%s"] * len(comment_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM posts_search WHERE rowid IN ({})".format(
+                placeholders
+            ),
+            [-pk for pk in comment_ids]
+        )
+        cursor.execute(
+            COMMENT_ROWS_SQL + " WHERE id IN ({})".format(placeholders),
+            comment_ids
+        )
+
+
+def unindex_comment(comment_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM posts_search WHERE rowid = %s",
+                       [-comment_id])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM posts_search")
+        cursor.execute(POST_ROWS_SQL)
+        cursor.execute(COMMENT_ROWS_SQL)
+        cursor.execute(
+            "INSERT INTO posts_search (posts_search) VALUES ('optimize')"
+        )
+        cursor.execute("SELECT count(*) FROM posts_search")
+        return cursor.fetchone()[0]
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(MARK_START, "<mark>").replace(
+            MARK_END, "</mark>"
+        )
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Результаты поиска по релевантности. Ключ курсора - ранг bm25
+    и id поста, поэтому страницы листаются без OFFSET, как и ленты.
+    Без FTS5 (не SQLite) ищет простым icontains по тексту постов.
+    """
+
+    def __init__(self, text, per_page):
+        self.query = build_query(text)
+        self.ranked = available()
+        posts = Post.objects.for_feed()
+        if not self.query:
+            posts = posts.none()
+        elif not self.ranked:
+            posts = posts.filter(text__icontains=text)
+        super().__init__(posts, per_page)
+
+    def cursor_values(self, obj):
+        if self.ranked:
+            return [obj.rank, obj.pk]
+        return super().cursor_values(obj)
+
+    def parse_values(self, values):
+        if self.ranked:
+            return [float(values[0]), int(values[1])]
+        return super().parse_values(values)
+
+    def fetch(self, values, backwards):
+        if not (self.ranked and self.query):
+            return super().fetch(values, backwards)
+        # Сначала страница из индекса, и только для неё - посты
+        # и сниппеты: соединять с постами все совпадения дорого
+        # У поста может совпасть несколько строк: ранг поста - лучший
+        # из рангов его текста и комментариев
+        documents = SearchDocument.objects.filter(query__match=self.query)
+        ranks = list(self.paginate_queryset(
+            documents.values("post_id").annotate(
+                best=Min("rank")
+            ).values_list("post_id", "best"),
+            values,
+            backwards,
+            ordering=("best", "post_id")
+        ))
+        best = dict(ranks)
+        snippets = {}
+        for pk, rank, snippet in documents.filter(
+            post_id__in=best
+        ).annotate(snippet=RawSQL(
+            "snippet(posts_search, -1, %s, %s, %s, %s)",
+            (MARK_START, MARK_END, "…", SNIPPET_TOKENS)
+        )).values_list("post_id", "rank", "snippet"):
+            if rank == best[pk]:
+                snippets.setdefault(pk, snippet)
+        posts = Post.objects.for_feed().in_bulk(snippets)
+        page = []
+        for pk, rank in ranks:
+            if pk in posts:
+                posts[pk].rank = rank
+                posts[pk].snippet = snippets[pk]
+                page.append(posts[pk])
+        return page
@@ -1 +1,51 @@
 PAGINATOR_PAGE_SIZE = 10
+COMMENTS_PAGE_SIZE = 50
+SYNDICATION_PAGE_SIZE = 20
+# Выборки до этого размера паджинатор считает точно, большие - оценивает
+EXACT_COUNT_LIMIT = 1000
+PAGE_RANGE_LIMIT = 100
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в ленту при чтении
+FANOUT_MAX_FOLLOWERS = 1000
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_BATCH_SIZE = 500
+# Дописывание лент после спуска автора ниже порога идёт в фоне
+TIMELINE_WORKERS = 1
+FEED_CACHE_TIMEOUT = 300
+# Варианты картинки поста: поле модели -> (ширина, высота)
+THUMBNAIL_SIZES = {
+    "image_thumb": (960, 339),
+    "image_preview": (320, 113),
+}
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_WORKERS = 2
+# Посты, получившие за минуту больше комментариев, принимают новые
+# через очередь на диске: фоновый поток пишет их в базу пачками
+COMMENT_HOT_THRESHOLD = 20
+COMMENT_FLUSH_INTERVAL = 1
+COMMENT_BATCH_SIZE = 500
+# Сколько автор видит свой комментарий из очереди, пока тот не в базе
+COMMENT_PENDING_TIMEOUT = 60
+# Множества подписок пользователей в кеше, сбрасываются при изменении
+FOLLOWING_CACHE_TIMEOUT = 600
+# Рекомендации «кого почитать»: сколько хранить и показывать на
+# пользователя, по скольку пользователей считать за раз и во сколько
+# раз подписка друга весомее общего с кем-то автора
+SUGGESTIONS_TOP_K = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_BATCH_SIZE = 1000
+SUGGESTIONS_FRIENDS_WEIGHT = 2.0
+# Популярное: счётчики по минутам копятся в памяти процесса и раз
+# в TRENDING_FLUSH_INTERVAL секунд пишутся в почасовые корзины, из
+# которых пересчитываются списки. Комментарий весит как несколько
+# просмотров
+TRENDING_FLUSH_INTERVAL = 60
+TRENDING_RING_MINUTES = 60
+TRENDING_WINDOW_HOURS = 24
+TRENDING_COMMENT_WEIGHT = 5
+TRENDING_SIZE = 10
+TRENDING_GROUP_SIZE = 5
+TRENDING_CACHE_TIMEOUT = 3600
+# Просмотры постов выгружаются вместе с популярным, по стольку постов
+# в одном UPDATE
+VIEW_COUNT_BATCH_SIZE = 300
@@ -0,0 +1,143 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import follow_graph, search, suggestions, timeline, trending
+from .feed_cache import bump_feed_version, bump_scopes, post_scopes
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.bump(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    UserStats.objects.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F("comment_count") + 1
+        )
+        trending.record_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=Greatest(F("comment_count") - 1, 0)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.bump(instance.author_id, followers_count=1)
+        UserStats.objects.bump(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        suggestions.follow_changed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    UserStats.objects.bump(instance.author_id, followers_count=-1)
+    UserStats.objects.bump(instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.follower_removed(instance.author_id)
+    suggestions.follow_changed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comments([instance.pk])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.unindex_comment(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # При переносе поста меняется и страница прежней группы
+    if instance.pk and not raw:
+        instance.saved_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list("group_id", flat=True).first()
+
+
+def changed_scopes(sender, instance):
+    if sender is Comment:
+        return post_scopes([instance.post_id])
+    if sender is Follow:
+        scopes = {"user:{}".format(instance.user_id)}
+        user_ids = [instance.user_id, instance.author_id]
+    else:
+        scopes = {"index", "post:{}".format(instance.pk)}
+        user_ids = [instance.author_id]
+        group_ids = {instance.group_id,
+                     getattr(instance, "saved_group_id", None)} - {None}
+        if group_ids:
+            scopes.update("group:" + slug for slug in Group.objects.filter(
+                pk__in=group_ids
+            ).values_list("slug", flat=True))
+    # Связанные объекты не трогаем: при каскадном удалении их уже нет
+    scopes.update("profile:" + username for username in User.objects.filter(
+        pk__in=user_ids
+    ).values_list("username", flat=True))
+    return scopes
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = changed_scopes(sender, instance)
+    bump_feed_version()
+    bump_scopes(scopes)
+    if connection.in_atomic_block:
+        # Повторно после коммита: иначе параллельный запрос успеет
+        # закешировать старые данные под новой версией
+        transaction.on_commit(bump_feed_version)
+        transaction.on_commit(lambda: bump_scopes(scopes))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_following(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    follow_graph.forget(instance.user_id)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: follow_graph.forget(instance.user_id))
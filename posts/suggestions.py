@@ -0,0 +1,201 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+A - матрица подписок пользователь x автор. Для пользователя u вес
+кандидата c складывается из двух частей:
+
+* друзья друзей: сколько авторов, на которых подписан u, подписаны
+  на c - строка u в A @ A, с весом SUGGESTIONS_FRIENDS_WEIGHT;
+* общие подписки: читатели, похожие на u по числу общих авторов
+  (A @ A.T без самого u), голосуют за своих авторов - (A @ A.T) @ A.
+
+Авторы, на которых u уже подписан, и сам u исключаются, в таблицу
+Suggestion ложатся SUGGESTIONS_TOP_K лучших. Строки считаются
+разреженными матрицами SciPy пачками по SUGGESTIONS_BATCH_SIZE; без
+SciPy - тот же расчёт на словарях множеств.
+
+Запрос подписки ничего не пересчитывает и не помечает. Пакетный расчёт
+хранит отпечаток подписок каждого пользователя и с --stale сам находит
+тех, чьи подписки изменились, и их читателей.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .feed_cache import bump_scopes
+from .models import Follow, Suggestion, UserStats
+from .settings import (SUGGESTIONS_BATCH_SIZE, SUGGESTIONS_FRIENDS_WEIGHT,
+                       SUGGESTIONS_SHOWN, SUGGESTIONS_TOP_K)
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+
+class Graph:
+    """Граф подписок в памяти: кто на кого подписан и кто на кого
+    подписан в обратную сторону."""
+
+    def __init__(self, edges):
+        self.following = defaultdict(set)
+        self.followers = defaultdict(set)
+        for user_id, author_id in edges:
+            self.following[user_id].add(author_id)
+            self.followers[author_id].add(user_id)
+
+    def fingerprint(self, user_id):
+        following = self.following.get(user_id)
+        if not following:
+            # Без подписок рекомендовать нечего, как и до первого расчёта
+            return None
+        # Хеш множества целых не зависит от PYTHONHASHSEED и помещается
+        # в BigIntegerField
+        return hash(frozenset(following))
+
+
+def load_graph():
+    return Graph(Follow.objects.values_list(
+        "user_id", "author_id"
+    ).iterator())
+
+
+def score(graph, user_ids, k, batch_size=SUGGESTIONS_BATCH_SIZE):
+    if sparse is None:
+        return score_python(graph, user_ids, k)
+    return score_sparse(graph, user_ids, k, batch_size)
+
+
+def score_sparse(graph, user_ids, k, batch_size=SUGGESTIONS_BATCH_SIZE):
+    edges = np.array([
+        (user_id, author_id)
+        for user_id, authors in graph.following.items()
+        for author_id in authors
+    ], dtype=np.int64).reshape(-1, 2)
+    ids = np.union1d(edges.ravel(), np.array(user_ids, dtype=np.int64))
+    size = len(ids)
+    follows = sparse.csr_matrix(
+        (np.ones(len(edges)), (np.searchsorted(ids, edges[:, 0]),
+                               np.searchsorted(ids, edges[:, 1]))),
+        shape=(size, size)
+    )
+    followed_by = follows.T.tocsr()
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        rows = np.searchsorted(ids, batch)
+        mine = follows[rows]
+        own = sparse.csr_matrix(
+            (np.ones(len(batch)), (np.arange(len(batch)), rows)),
+            shape=(len(batch), size)
+        )
+        similar = mine @ followed_by
+        # Сам с собой пользователь делит все свои подписки
+        similar = similar - similar.multiply(own)
+        scores = (mine @ follows * SUGGESTIONS_FRIENDS_WEIGHT
+                  + similar @ follows)
+        scores = (scores - scores.multiply((mine + own) > 0)).tocsr()
+        scores.eliminate_zeros()
+        for i, user_id in enumerate(batch):
+            part = slice(scores.indptr[i], scores.indptr[i + 1])
+            values = scores.data[part]
+            authors = ids[scores.indices[part]]
+            top = np.lexsort((authors, -values))[:k]
+            yield user_id, list(zip(authors[top].tolist(),
+                                    values[top].tolist()))
+
+
+def score_python(graph, user_ids, k):
+    following = graph.following
+    followers = graph.followers
+    for user_id in user_ids:
+        mine = following.get(user_id, set())
+        scores = Counter()
+        for friend in mine:
+            for author_id in following.get(friend, ()):
+                scores[author_id] += SUGGESTIONS_FRIENDS_WEIGHT
+        similar = Counter()
+        for author_id in mine:
+            similar.update(followers[author_id])
+        similar.pop(user_id, None)
+        for other, weight in similar.items():
+            for author_id in following[other]:
+                scores[author_id] += weight
+        for author_id in mine | {user_id}:
+            scores.pop(author_id, None)
+        # Лучшие k без сортировки всех кандидатов
+        yield user_id, heapq.nsmallest(
+            k, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+
+
+def build(user_ids=None, k=SUGGESTIONS_TOP_K,
+          batch_size=SUGGESTIONS_BATCH_SIZE, stale=False):
+    """Пересчитывает рекомендации пользователей user_ids (по умолчанию
+    всех, у кого есть подписки, а со stale - тех, у кого они устарели)
+    и возвращает их число."""
+    graph = load_graph()
+    if stale:
+        user_ids = stale_users(graph)
+    elif user_ids is None:
+        user_ids = sorted(graph.following)
+        with transaction.atomic():
+            Suggestion.objects.exclude(user_id__in=user_ids).delete()
+    user_ids = list(user_ids)
+    batch = {}
+    for user_id, top in score(graph, user_ids, k, batch_size):
+        batch[user_id] = top
+        if len(batch) >= batch_size:
+            save(batch, graph)
+            batch = {}
+    save(batch, graph)
+    bump_scopes(["suggestions"])
+    return len(user_ids)
+
+
+def save(batch, graph):
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=list(batch)).delete()
+        Suggestion.objects.bulk_create([
+            Suggestion(user_id=user_id, author_id=author_id, score=value)
+            for user_id, top in batch.items()
+            for author_id, value in top
+        ], batch_size=SUGGESTIONS_BATCH_SIZE)
+        # Подписка во время расчёта изменит граф, и пользователь снова
+        # окажется среди устаревших
+        UserStats.objects.bulk_update([
+            UserStats(user_id=user_id,
+                      suggestions_graph=graph.fingerprint(user_id))
+            for user_id in batch
+        ], ["suggestions_graph"], batch_size=SUGGESTIONS_BATCH_SIZE)
+
+
+def stale_users(graph=None):
+    """Пользователи, чьи подписки изменились после расчёта, и их
+    читатели: у читателей изменились друзья друзей."""
+    graph = graph or load_graph()
+    changed = {
+        user_id
+        for user_id, fingerprint in UserStats.objects.values_list(
+            "user_id", "suggestions_graph"
+        ).iterator()
+        if fingerprint != graph.fingerprint(user_id)
+    }
+    stale = set(changed)
+    for user_id in changed:
+        stale.update(graph.followers.get(user_id, ()))
+    return sorted(stale)
+
+
+def follow_changed(user_id, author_id):
+    """Новая подписка сразу убирает автора из рекомендаций, пересчёт -
+    дело пакетного расчёта."""
+    Suggestion.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def for_user(user):
+    if not user.is_authenticated:
+        return []
+    return list(Suggestion.objects.filter(user=user).select_related(
+        "author"
+    ).order_by("-score", "author")[:SUGGESTIONS_SHOWN])
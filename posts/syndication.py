@@ -0,0 +1,148 @@
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+
+from .paginator import CursorPaginator
+from .settings import SYNDICATION_PAGE_SIZE
+
+CONTENT_TYPES = {
+    "rss": "application/rss+xml; charset=utf-8",
+    "atom": "application/atom+xml; charset=utf-8",
+    "json": "application/feed+json; charset=utf-8",
+}
+
+
+def post_title(post):
+    return Truncator(post.text).chars(50)
+
+
+class Feed:
+    """Лента для агрегаторов: одна страница курсорной выдачи,
+    отдаваемая по записи за раз. Ссылка на следующую страницу -
+    тот же курсор, что и на HTML-страницах.
+    """
+
+    def __init__(self, request, posts, title, link):
+        self.request = request
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.self_link = request.build_absolute_uri()
+        paginator = CursorPaginator(posts, SYNDICATION_PAGE_SIZE)
+        self.page = paginator.get_page(request.GET.get("cursor"))
+        # Страницу выбираем сразу, чтобы ошибки базы были ошибками
+        # вьюхи, а не оборванным потоком
+        self.posts = self.page.object_list
+
+    @property
+    def next_link(self):
+        if self.page.next_cursor:
+            return self.request.build_absolute_uri(
+                "?cursor=" + self.page.next_cursor
+            )
+        return None
+
+    @property
+    def updated(self):
+        if self.posts:
+            return self.posts[0].pub_date
+        return None
+
+    def url(self, post):
+        return self.request.build_absolute_uri(reverse("post", kwargs={
+            "username": post.author.username,
+            "post_id": post.pk
+        }))
+
+    def rss(self):
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield ('<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+               'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>')
+        yield (
+            "<title>{0}</title><link>{1}</link>"
+            "<description>{0}</description>".format(
+                escape(self.title), escape(self.link)
+            )
+        )
+        yield '<atom:link rel="self" href={}/>'.format(
+            quoteattr(self.self_link)
+        )
+        if self.next_link:
+            yield '<atom:link rel="next" href={}/>'.format(
+                quoteattr(self.next_link)
+            )
+        if self.updated:
+            yield "<lastBuildDate>{}</lastBuildDate>".format(
+                rfc2822_date(self.updated)
+            )
+        for post in self.posts:
+            url = escape(self.url(post))
+            yield (
+                "<item><title>{}</title><link>{}</link>"
+                "<description>{}</description><dc:creator>{}</dc:creator>"
+                '<guid isPermaLink="true">{}</guid><pubDate>{}</pubDate>'
+                "</item>".format(
+                    escape(post_title(post)), url, escape(post.text),
+                    escape(post.author.username), url,
+                    rfc2822_date(post.pub_date)
+                )
+            )
+        yield "</channel></rss>\n"
+
+    def atom(self):
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield '<feed xmlns="http://www.w3.org/2005/Atom">'
+        yield "<title>{}</title><id>{}</id>".format(
+            escape(self.title), escape(self.link)
+        )
+        yield '<link rel="alternate" href={}/>'.format(quoteattr(self.link))
+        yield '<link rel="self" href={}/>'.format(quoteattr(self.self_link))
+        if self.next_link:
+            yield '<link rel="next" href={}/>'.format(
+                quoteattr(self.next_link)
+            )
+        if self.updated:
+            yield "<updated>{}</updated>".format(rfc3339_date(self.updated))
+        for post in self.posts:
+            url = escape(self.url(post))
+            yield (
+                "<entry><title>{}</title><link href=\"{}\"/><id>{}</id>"
+                "<updated>{}</updated><published>{}</published>"
+                "<author><name>{}</name></author>"
+                '<content type="text">{}</content></entry>'.format(
+                    escape(post_title(post)), url, url,
+                    rfc3339_date(post.pub_date), rfc3339_date(post.pub_date),
+                    escape(post.author.username), escape(post.text)
+                )
+            )
+        yield "</feed>\n"
+
+    def json(self):
+        header = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": self.title,
+            "home_page_url": self.link,
+            "feed_url": self.self_link,
+        }
+        if self.next_link:
+            header["next_url"] = self.next_link
+        # Открытый объект: записи дописываются в массив items по одной
+        yield json.dumps(header, ensure_ascii=False)[:-1] + ', "items": ['
+        for i, post in enumerate(self.posts):
+            item = {
+                "id": self.url(post),
+                "url": self.url(post),
+                "title": post_title(post),
+                "content_text": post.text,
+                "date_published": rfc3339_date(post.pub_date),
+                "authors": [{"name": post.author.username}],
+            }
+            yield ", " * bool(i) + json.dumps(item, ensure_ascii=False)
+        yield "]}\n"
+
+    def response(self, fmt):
+        return StreamingHttpResponse(getattr(self, fmt)(),
+                                     content_type=CONTENT_TYPES[fmt])
@@ -0,0 +1,58 @@
+from django import template
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+
+from posts import follow_graph
+from posts.settings import FEED_CACHE_TIMEOUT
+
+register = template.Library()
+
+
+def page_author_ids(posts, key):
+    if not key:
+        return {post.author_id for post in posts}
+    # Авторы лежат рядом с фрагментом страницы и с тем же ключом: при
+    # попадании во фрагмент посты из базы не читаются
+    cache = caches["fragments"]
+    cache_key = make_template_fragment_key("following_style", key)
+    ids = cache.get(cache_key)
+    if ids is None:
+        ids = {post.author_id for post in posts}
+        cache.set(cache_key, ids, FEED_CACHE_TIMEOUT)
+    return ids
+
+
+@register.simple_tag(takes_context=True)
+def following_style(context, posts, *key):
+    """Стиль кнопок подписки на карточках постов. Карточки кешируются
+    общими для всех, поэтому, как и кнопку редактирования, состояние
+    для пользователя включает стиль страницы - только для авторов её
+    постов. Если посты во фрагменте кеша, key - части его ключа:
+    авторов запоминаем и для гостя, чтобы следующий пользователь
+    получил их вместе с фрагментом."""
+    author_ids = page_author_ids(posts, key)
+    user = context["user"]
+    if not user.is_authenticated:
+        return ""
+    rules = [
+        ".post-follow { display: inline-block; }",
+        '.post-follow[data-author="{}"] {{ display: none; }}'.format(
+            user.get_username()
+        ),
+    ]
+    states = follow_graph.follow_states(
+        user, sorted(author_ids - {user.pk})
+    )
+    selectors = [
+        '.post-follow[data-author-id="{}"]'.format(author_id)
+        for author_id, following in states.items() if following
+    ]
+    if selectors:
+        rules.append("{} {{ display: none; }}".format(
+            ", ".join(selector + " .follow" for selector in selectors)
+        ))
+        rules.append("{} {{ display: inline-block; }}".format(
+            ", ".join(selector + " .unfollow" for selector in selectors)
+        ))
+    return mark_safe("\n".join(rules))
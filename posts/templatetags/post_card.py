@@ -0,0 +1,71 @@
+from django import template
+from django.template.base import render_value_in_context
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from posts import search
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста, как в post_item.html, собранная в Python.
+
+    Карточек в ленте по десятку на страницу, и include на каждую
+    разбирает контекст и обходит дерево из нескольких десятков узлов.
+    Разметка должна совпадать с post_item.html, тест это проверяет.
+    """
+    username = post.author.username
+    parts = ['<div class="card mb-3 mt-1 shadow-sm">']
+    if post.image:
+        parts.append(format_html(
+            '<img class="card-img" src="{0}" srcset="{1} 320w, {0} 960w" />',
+            post.thumb_url, post.preview_url
+        ))
+    snippet = getattr(post, "snippet", "")
+    if snippet:
+        text = linebreaksbr(search.highlight(snippet), autoescape=True)
+    else:
+        text = linebreaksbr(mark_safe(post.text), autoescape=True)
+    parts.append(format_html(
+        '<div class="card-body"><p class="card-text">'
+        '<a name="post_{}" href="{}">'
+        '<strong class="d-block text-gray-dark">@{}</strong></a>{}</p>',
+        post.id, reverse("profile", args=[username]), post.author, text
+    ))
+    if post.group:
+        parts.append(format_html(
+            '<a class="card-link muted" href="{}">'
+            '<strong class="d-block text-gray-dark">#{}</strong></a>',
+            reverse("group", args=[post.group.slug]), post.group.title
+        ))
+    parts.append('<div class="d-flex justify-content-between '
+                 'align-items-center"><div class="btn-group">')
+    if post.comment_count:
+        parts.append(format_html("<div>Комментариев: {}</div>",
+                                 post.comment_count))
+    if post.view_count:
+        parts.append(format_html("<div>Просмотров: {}</div>",
+                                 post.view_count))
+    parts.append(format_html(
+        '<a class="btn btn-sm btn-primary" href="{}" role="button">'
+        "Добавить комментарий</a>"
+        '<a class="btn btn-sm btn-info post-edit" data-author="{}" '
+        'href="{}" role="button">Редактировать</a>'
+        '<span class="post-follow" data-author="{}" data-author-id="{}">'
+        '<a class="btn btn-sm btn-outline-primary follow" href="{}" '
+        'role="button">Подписаться</a>'
+        '<a class="btn btn-sm btn-outline-secondary unfollow" href="{}" '
+        'role="button">Отписаться</a></span></div>'
+        '<small class="text-muted">{}</small></div></div></div>',
+        reverse("post", args=[username, post.id]), username,
+        reverse("post_edit", args=[username, post.id]),
+        username, post.author_id,
+        reverse("profile_follow", args=[username]),
+        reverse("profile_unfollow", args=[username]),
+        render_value_in_context(post.pub_date, context)
+    ))
+    return mark_safe("".join(parts))
@@ -0,0 +1,56 @@
+import random
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import Comment, Post, User
+from posts.urls import urlpatterns as posts_urls
+from users.urls import urlpatterns as users_urls
+
+
+class BenchmarkTest(TestCase):
+    def test_every_route_is_covered(self):
+        names = {pattern.name for pattern in posts_urls + users_urls}
+        self.assertEqual(names, set(benchmark.ROUTES))
+
+    def test_run(self):
+        data = benchmark.seed(users=5, groups=2, posts=30, comments=20,
+                              follows=10)
+        results = benchmark.run(data, requests=3)
+        self.assertEqual(set(results), set(benchmark.ROUTES))
+        for name, result in results.items():
+            with self.subTest(route=name):
+                self.assertEqual(result["requests"], 3)
+                self.assertEqual(result["errors"], 0)
+                self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+    def test_run_keeps_site_cache(self):
+        data = benchmark.seed(users=2, groups=1, posts=3, comments=1,
+                              follows=1)
+        cache.set("site-key", "value")
+        benchmark.run(data, requests=1, routes=["index"])
+        self.assertEqual(cache.get("site-key"), "value")
+
+    def test_contention_steps(self):
+        benchmark.seed(users=3, groups=1, posts=5, comments=5, follows=2)
+        post_ids = list(Post.objects.values_list("pk", flat=True))
+        user_ids = list(User.objects.values_list("pk", flat=True))
+        rng = random.Random(0)
+        benchmark.read_step(rng, post_ids)
+        post_id = benchmark.write_step(rng, post_ids, user_ids)
+        self.assertTrue(Post.objects.filter(pk=post_id).exists())
+        self.assertEqual(Comment.objects.count(), 6)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+
+    def test_compare(self):
+        baseline = {"routes": {"index": {"p95_ms": 10, "queries": 1}}}
+        similar = {"routes": {"index": {"p95_ms": 11, "queries": 1}}}
+        slower = {"routes": {"index": {"p95_ms": 13, "queries": 2}}}
+        self.assertEqual(benchmark.compare(similar, baseline), [])
+        self.assertEqual(len(benchmark.compare(slower, baseline)), 2)
@@ -0,0 +1,53 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from yatube.cache import TwoTierCache
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.cache = TwoTierCache(None, {"OPTIONS": {
+            "L2": "default",
+            "L1_TIMEOUT": 5,
+            "L1_MAX_ENTRIES": 2,
+        }})
+
+    def test_reads_through_to_shared_cache(self):
+        cache.set("key", "shared")
+        self.assertEqual(self.cache.get("key"), "shared")
+        cache.delete("key")
+        self.assertEqual(self.cache.get("key"), "shared")
+
+    def test_writes_go_to_both_tiers(self):
+        self.cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        self.cache.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+        self.assertIsNone(cache.get("key"))
+
+    def test_local_tier_expires(self):
+        self.cache.set("key", "value")
+        cache.set("key", "new")
+        self.assertEqual(self.cache.get("key"), "value")
+        with mock.patch("yatube.cache.time.monotonic",
+                        return_value=time.monotonic() + 6):
+            self.assertEqual(self.cache.get("key"), "new")
+
+    def test_local_tier_is_lru_bounded(self):
+        for key in ("a", "b"):
+            self.cache.set(key, key)
+        self.cache.get("a")
+        self.cache.set("c", "c")
+        cache.clear()
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.get("c"), "c")
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_incr_bypasses_local_tier(self):
+        self.cache.set("counter", 1)
+        self.assertEqual(self.cache.incr("counter"), 2)
+        self.assertEqual(self.cache.get("counter"), 2)
@@ -0,0 +1,167 @@
+import datetime as dt
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import comment_queue
+from posts.feed_cache import feed_version
+from posts.models import Comment, Post
+
+
+class CommentQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+        cls.post = Post.objects.create(text="пост", author=cls.author)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.spool = tempfile.mkdtemp()
+        settings = override_settings(COMMENT_SPOOL_DIR=self.spool)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch("posts.comment_queue.start_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse("add_comment", kwargs={
+            "username": "author", "post_id": self.post.pk
+        })
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.spool)
+
+    def post_url(self):
+        return reverse("post", kwargs={
+            "username": "author", "post_id": self.post.pk
+        })
+
+    def test_hot_post_comments_go_through_queue(self):
+        with mock.patch("posts.comment_queue.COMMENT_HOT_THRESHOLD", 1):
+            self.client.post(self.url, {"text": "синхронно"})
+            # Сессия, пользователь и проверка поста, записи в базу нет
+            with self.assertNumQueries(3):
+                response = self.client.post(self.url, {"text": "в очереди"})
+        self.assertRedirects(response, self.post_url())
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(len(os.listdir(self.spool)), 1)
+
+    def test_missing_post_is_not_queued(self):
+        url = reverse("add_comment", kwargs={
+            "username": "author", "post_id": self.post.pk + 100
+        })
+        with mock.patch("posts.comment_queue.COMMENT_HOT_THRESHOLD", 0):
+            response = self.client.post(url, {"text": "в никуда"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(os.listdir(self.spool), [])
+
+    def test_author_sees_own_queued_comment(self):
+        self.client.get(self.post_url())
+        etag = self.client.get(self.post_url())["ETag"]
+        comment_queue.enqueue(self.post.pk, self.reader, "в очереди")
+        self.client.cookies[comment_queue.PENDING_COOKIE] = "token"
+        response = self.client.get(self.post_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "в очереди")
+        self.assertEqual(len(response.context["pending_comments"]), 1)
+
+        other = Client()
+        other.force_login(self.author)
+        self.assertNotContains(other.get(self.post_url()), "в очереди")
+
+        comment_queue.flush()
+        response = self.client.get(self.post_url())
+        self.assertContains(response, "в очереди", count=1)
+        self.assertEqual(response.context["pending_comments"], [])
+
+    def test_flush_writes_batch_and_invalidates(self):
+        for i in range(3):
+            comment_queue.enqueue(self.post.pk, self.reader, str(i))
+        comment_queue.enqueue(self.post.pk + 100, self.reader, "удалён")
+        version = feed_version()
+        written = comment_queue.flush()
+        self.assertEqual(written, 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(os.listdir(self.spool), [])
+        self.assertGreater(feed_version(), version)
+
+    def test_flush_is_idempotent(self):
+        entry = comment_queue.enqueue(self.post.pk, self.reader, "текст")
+        comment_queue.flush()
+        # Файл, не удалённый после записи, выгружается повторно
+        comment_queue.append(entry)
+        self.assertEqual(comment_queue.flush(), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_flush_keeps_created(self):
+        created = timezone.now() - dt.timedelta(minutes=5)
+        with mock.patch("posts.comment_queue.timezone.now",
+                        return_value=created):
+            comment_queue.enqueue(self.post.pk, self.reader, "текст")
+        comment_queue.flush()
+        self.assertEqual(Comment.objects.get().created, created)
+
+    def test_concurrent_flush(self):
+        entry = comment_queue.enqueue(self.post.pk, self.reader, "текст")
+        # Та же запись дважды в пачке и файл, который после чтения
+        # забрал другой выгрузчик
+        comment_queue.append(entry)
+        read = comment_queue.read
+
+        def read_and_steal(path):
+            entries = read(path)
+            os.remove(path)
+            return entries
+
+        with mock.patch("posts.comment_queue.read", read_and_steal):
+            self.assertEqual(comment_queue.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_counters_follow_inserted_rows(self):
+        first = comment_queue.enqueue(self.post.pk, self.reader, "первый")
+        comment_queue.enqueue(self.post.pk, self.reader, "второй")
+        bulk_create = Comment.objects.bulk_create
+
+        def lose_first(comments, **kwargs):
+            # Строку первого комментария пропустил конфликт
+            return bulk_create([
+                comment for comment in comments
+                if comment.queue_token.hex != first["token"]
+            ], **kwargs)
+
+        with mock.patch.object(Comment.objects, "bulk_create", lose_first):
+            self.assertEqual(comment_queue.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(Comment.objects.get().text, "второй")
+
+    def test_claim_refreshes_mtime(self):
+        comment_queue.enqueue(self.post.pk, self.reader, "текст")
+        path = comment_queue.spool_path()
+        old = time.time() - comment_queue.STALE_SECONDS * 2
+        os.utime(path, (old, old))
+        claimed = comment_queue.claim()
+        # Только что забранный файл не считается брошенным
+        self.assertEqual(comment_queue.claim(), [])
+        self.assertEqual(len(claimed), 1)
+
+    def test_command(self):
+        comment_queue.enqueue(self.post.pk, self.reader, "текст")
+        out = StringIO()
+        call_command("flush_comments", stdout=out)
+        self.assertIn("1", out.getvalue())
+        self.assertTrue(Comment.objects.filter(text="текст").exists())
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Group, Post
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+        cls.group = Group.objects.create(title="group", slug="group")
+        cls.other_group = Group.objects.create(title="other", slug="other")
+        cls.post = Post.objects.create(
+            text="test",
+            author=cls.author,
+            group=cls.group
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse("index"),
+            reverse("group", kwargs={"slug": "group"}),
+            reverse("profile", kwargs={"username": "author"}),
+            reverse("post", kwargs={"username": "author",
+                                    "post_id": self.post.pk}),
+        ]
+
+    def revalidate(self, client, url):
+        etag = client.get(url)["ETag"]
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.revalidate(self.guest_client, url)
+                self.assertEqual(response.status_code, 304)
+
+    def test_modified_after_write(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)["ETag"]
+                Comment.objects.create(
+                    post=self.post,
+                    author=self.reader,
+                    text="comment"
+                )
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)["ETag"]
+                response = self.reader_client.get(url,
+                                                  HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_cursor(self):
+        url = reverse("index")
+        etag = self.guest_client.get(url)["ETag"]
+        response = self.guest_client.get(url + "?cursor=x",
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unrelated_write_keeps_etag(self):
+        urls = self.urls()[1:]
+        etags = {url: self.guest_client.get(url)["ETag"] for url in urls}
+        other = get_user_model().objects.create(username="other")
+        Post.objects.create(text="other", author=other,
+                            group=self.other_group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn("Cookie", response["Vary"])
+
+    def test_moved_post_changes_old_group(self):
+        url = reverse("group", kwargs={"slug": "group"})
+        etag = self.guest_client.get(url)["ETag"]
+        self.post.group = self.other_group
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_csrf_cookie(self):
+        url = self.urls()[-1]
+        etag = self.reader_client.get(url)["ETag"]
+        self.reader_client.cookies[settings.CSRF_COOKIE_NAME] = "rotated"
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_flushed_views_change_post_etag(self):
+        url = self.urls()[-1]
+        etag = self.guest_client.get(url)["ETag"]
+        with mock.patch("posts.trending.start_flusher"):
+            trending.record_view(self.post.pk)
+            trending.write(trending.ring.drain())
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
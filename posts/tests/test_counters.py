@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        post = Post.objects.create(text="test", author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text="test", author=self.author)
+        comment = Comment.objects.create(
+            post=post,
+            author=self.reader,
+            text="comment"
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_drifted_counters_do_not_go_negative(self):
+        # bulk_create не шлёт сигналов, счётчики остаются нулевыми
+        Follow.objects.bulk_create([Follow(user=self.reader,
+                                           author=self.author)])
+        post = Post.objects.create(text="test", author=self.author)
+        Comment.objects.bulk_create([Comment(post=post, author=self.reader,
+                                             text="comment")])
+        Follow.objects.get().delete()
+        Comment.objects.get().delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_profile_reads_counters_from_stats(self):
+        Post.objects.create(text="test", author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse("profile", kwargs={"username": "author"})
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.context.get("followed_count"), 1)
+        self.assertEqual(response.context.get("following_count"), 0)
+        self.assertEqual(response.context.get("posts_count"), 1)
+
+    def test_recount_stats_command(self):
+        post = Post.objects.create(text="test", author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text="test")
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.all().delete()
+        Post.objects.update(comment_count=0)
+        call_command("recount_stats", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow, Post, UserStats
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = get_user_model().objects.create(username="reader")
+        cls.authors = [
+            get_user_model().objects.create(username="author{}".format(i))
+            for i in range(3)
+        ]
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_follow_is_insert_or_ignore(self):
+        author = self.authors[0]
+        self.assertTrue(follow_graph.follow(self.reader, author))
+        self.assertFalse(follow_graph.follow(self.reader, author))
+        self.assertFalse(follow_graph.follow(self.reader, self.reader))
+        self.assertEqual(Follow.objects.count(), 1)
+        stats = UserStats.objects.get(user=author)
+        self.assertEqual(stats.followers_count, 1)
+
+        self.assertTrue(follow_graph.unfollow(self.reader, author))
+        self.assertFalse(follow_graph.unfollow(self.reader, author))
+        stats.refresh_from_db()
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_follow_states_batch(self):
+        follow_graph.follow(self.reader, self.authors[1])
+        ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            states = follow_graph.follow_states(self.reader, ids)
+        self.assertEqual(states, {
+            self.authors[0].pk: False,
+            self.authors[1].pk: True,
+            self.authors[2].pk: False,
+        })
+        with self.assertNumQueries(0):
+            follow_graph.follow_states(self.reader, ids)
+
+    def test_cache_invalidated_on_change(self):
+        self.assertEqual(follow_graph.following_ids(self.reader.pk),
+                         frozenset())
+        follow_graph.follow(self.reader, self.authors[0])
+        self.assertEqual(follow_graph.following_ids(self.reader.pk),
+                         {self.authors[0].pk})
+        follow_graph.unfollow(self.reader, self.authors[0])
+        self.assertEqual(follow_graph.following_ids(self.reader.pk),
+                         frozenset())
+
+    def test_feed_buttons_follow_state(self):
+        for author in self.authors:
+            Post.objects.create(text="пост", author=author)
+        follow_graph.follow(self.reader, self.authors[2])
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse("index"))
+        self.assertContains(response, 'data-author-id="{}"'.format(
+            self.authors[0].pk
+        ))
+        self.assertContains(
+            response,
+            '.post-follow[data-author-id="{}"] .unfollow'.format(
+                self.authors[2].pk
+            )
+        )
+        self.assertNotContains(
+            response,
+            '.post-follow[data-author-id="{}"] .unfollow'.format(
+                self.authors[0].pk
+            )
+        )
+
+    def test_feed_style_only_for_page_authors(self):
+        Post.objects.create(text="пост", author=self.authors[0])
+        Post.objects.create(text="пост", author=self.authors[1])
+        follow_graph.follow(self.reader, self.authors[1])
+        follow_graph.follow(self.reader, self.authors[2])
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse("index"))
+        self.assertContains(
+            response,
+            '.post-follow[data-author-id="{}"] .unfollow'.format(
+                self.authors[1].pk
+            )
+        )
+        # На кого ещё подписан читатель, в стиле страницы не видно
+        self.assertNotContains(
+            response, 'data-author-id="{}"'.format(self.authors[2].pk)
+        )
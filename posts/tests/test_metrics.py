@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube import metrics
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.staff = get_user_model().objects.create(username="staff",
+                                                    is_staff=True)
+        cls.user = get_user_model().objects.create(username="user")
+
+    def setUp(self) -> None:
+        cache.clear()
+        metrics.recorder.reset()
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_server_timing(self):
+        response = self.guest_client.get(reverse("index"))
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^sql;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, '
+            r'total;dur=[\d.]+$'
+        )
+
+    def test_endpoint_is_staff_only(self):
+        user_client = Client()
+        user_client.force_login(self.user)
+        for client in (self.guest_client, user_client):
+            response = client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, 302)
+        response = self.staff_client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_json(self):
+        for _ in range(3):
+            self.guest_client.get(reverse("index"))
+        self.guest_client.get(reverse("profile", kwargs={"username": "user"}))
+        routes = self.staff_client.get(reverse("metrics")).json()["routes"]
+        self.assertEqual(routes["index"]["count"], 3)
+        self.assertEqual(routes["profile"]["count"], 1)
+        self.assertGreater(routes["profile"]["queries_avg"], 0)
+        self.assertGreater(routes["profile"]["render_ms_avg"], 0)
+        self.assertEqual(sum(routes["index"]["total_ms_buckets"].values()), 3)
+
+    def test_prometheus(self):
+        self.guest_client.get(reverse("index"))
+        response = self.staff_client.get(reverse("metrics"),
+                                         {"format": "prometheus"})
+        text = response.content.decode()
+        self.assertIn("# TYPE yatube_total_seconds histogram", text)
+        self.assertIn('yatube_total_seconds_bucket{route="index",le="+Inf"} 1',
+                      text)
+        self.assertIn('yatube_sql_seconds_count{route="index"} 1', text)
+
+    def test_processes_do_not_overwrite_each_other(self):
+        other = metrics.Recorder()
+        metrics.recorder.record("index", 1, dict.fromkeys(metrics.TIMINGS, 1))
+        other.record("index", 2, dict.fromkeys(metrics.TIMINGS, 1))
+        collected = metrics.recorder.collect()
+        self.assertEqual(collected["index"]["count"], 2)
+        self.assertEqual(collected["index"]["queries"], 3)
+
+    @override_settings(METRICS={"SLOW_QUERY_MS": 0})
+    def test_slow_queries_logged(self):
+        url = reverse("profile", kwargs={"username": "user"})
+        with self.assertLogs("yatube.sql", "WARNING") as logs:
+            self.guest_client.get(url)
+        self.assertIn("profile (posts.views.profile)", logs.output[0])
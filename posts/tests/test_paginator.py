@@ -1,10 +1,14 @@
 import datetime as dt
+from unittest import mock
+
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from posts.models import Post
+from posts.models import Comment, Post
+from posts.paginator import (ApproximatePaginator, CommentPaginator,
+                             CursorPaginator, InvalidCursor)
 
 
 class PaginatorViewsTest(TestCase):
@@ -29,5 +33,146 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context.get('page').object_list), 10)
 
     def test_second_page_containse_three_records(self):
-        response = self.client.get(reverse('index') + '?page=2')
+        page = self.client.get(reverse('index')).context.get('page')
+        response = self.client.get(
+            reverse('index') + '?cursor=' + page.next_cursor
+        )
         self.assertEqual(len(response.context.get('page').object_list), 3)
+
+    def test_previous_cursor_returns_first_page(self):
+        first = self.client.get(reverse('index')).context.get('page')
+        second = self.client.get(
+            reverse('index') + '?cursor=' + first.next_cursor
+        ).context.get('page')
+        response = self.client.get(
+            reverse('index') + '?cursor=' + second.previous_cursor
+        )
+        page = response.context.get('page')
+        self.assertEqual(page.object_list, first.object_list)
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_page_api_does_not_fail(self):
+        page = self.client.get(reverse('index')).context.get('page')
+        self.assertEqual(page.next_page_number(), page.next_cursor)
+        self.assertIsNone(page.previous_page_number())
+        self.assertIsNone(page.start_index())
+        self.assertIsNone(page.end_index())
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('index') + '?cursor=broken')
+        page = response.context.get('page')
+        self.assertEqual(len(page.object_list), 10)
+        self.assertFalse(page.has_previous())
+
+    def test_equal_pub_date_is_not_skipped(self):
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        page = paginator.get_page(None)
+        seen = []
+        while True:
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(
+            seen,
+            list(Post.objects.order_by("-id").values_list("id", flat=True))
+        )
+
+
+class ApproximatePaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="test")
+        for i in range(13):
+            Post.objects.create(text="test" + str(i), author=cls.author)
+
+    def test_total_from_counter(self):
+        paginator = ApproximatePaginator(Post.objects.all(), 5, total=40)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 40)
+            self.assertEqual(paginator.num_pages, 8)
+
+    def test_small_result_is_exact(self):
+        paginator = ApproximatePaginator(Post.objects.all(), 5)
+        self.assertEqual(paginator.count, 13)
+        self.assertFalse(paginator.approximate)
+
+    @mock.patch("posts.paginator.EXACT_COUNT_LIMIT", 5)
+    def test_large_table_is_estimated(self):
+        Post.objects.filter(text="test0").delete()
+        last_pk = Post.objects.latest("pk").pk
+        paginator = ApproximatePaginator(Post.objects.all(), 5)
+        with self.assertNumQueries(2):
+            self.assertEqual(paginator.count, last_pk)
+        self.assertTrue(paginator.approximate)
+
+    @mock.patch("posts.paginator.EXACT_COUNT_LIMIT", 5)
+    def test_large_filtered_result_is_bounded(self):
+        paginator = ApproximatePaginator(
+            Post.objects.filter(author=self.author), 5
+        )
+        self.assertEqual(paginator.count, 6)
+        self.assertTrue(paginator.approximate)
+
+    @mock.patch("posts.paginator.PAGE_RANGE_LIMIT", 2)
+    def test_page_range_is_capped(self):
+        paginator = ApproximatePaginator(Post.objects.all(), 5)
+        self.assertEqual(list(paginator.page_range), [1, 2])
+
+    def test_profile_paginator_uses_stats(self):
+        response = self.client.get(
+            reverse("profile", kwargs={"username": "test"})
+        )
+        paginator = response.context["paginator"]
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 13)
+
+
+class CommentPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="test")
+        cls.post = Post.objects.create(text="test", author=cls.author)
+        created = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+        for i in range(5):
+            Comment.objects.create(post=cls.post, author=cls.author,
+                                   text="comment" + str(i))
+        # Одинаковое время: порядок держится на id
+        Comment.objects.update(created=created)
+        cls.post.refresh_from_db()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_thread_pages(self):
+        paginator = CommentPaginator(self.post, 2)
+        pages = []
+        cursor = None
+        while True:
+            comments, cursor = paginator.thread(cursor)
+            pages.append(self.texts(comments))
+            if cursor is None:
+                break
+        self.assertEqual(pages, [
+            ["comment0", "comment1"],
+            ["comment2", "comment3"],
+            ["comment4"],
+        ])
+
+    def test_first_page_uses_counter(self):
+        paginator = CommentPaginator(self.post, 5)
+        with self.assertNumQueries(1):
+            comments, cursor = paginator.thread()
+        self.assertEqual(len(comments), 5)
+        self.assertIsNone(cursor)
+
+    def test_backwards_cursor_is_invalid(self):
+        paginator = CommentPaginator(self.post, 2)
+        comments, _ = paginator.thread()
+        cursor = paginator.encode_cursor(comments[1], "p")
+        with self.assertRaises(InvalidCursor):
+            paginator.thread(cursor)
@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from posts import benchmark, search
+from posts.models import Comment, Group, Post
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+class PostCardTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.settings = override_settings(MEDIA_ROOT=cls.media)
+        cls.settings.enable()
+        author = get_user_model().objects.create(username="author")
+        group = Group.objects.create(title="<Группа>", slug="group",
+                                     description="")
+        Post.objects.create(text="простой", author=author)
+        post = Post.objects.create(
+            text="с <b>разметкой</b>\nи картинкой", author=author,
+            group=group,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif")
+        )
+        Comment.objects.create(post=post, author=author, text="c")
+        Post.objects.filter(pk=post.pk).update(view_count=7)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.settings.disable()
+        shutil.rmtree(cls.media)
+        super().tearDownClass()
+
+    def assert_same_card(self, post):
+        card = Template("{% load post_card %}{% post_card post %}").render(
+            Context({"post": post})
+        )
+        self.assertHTMLEqual(
+            card, render_to_string("post_item.html", {"post": post})
+        )
+
+    def test_matches_post_item_template(self):
+        for post in Post.objects.for_feed():
+            with self.subTest(text=post.text):
+                self.assert_same_card(post)
+
+    def test_matches_search_snippet(self):
+        post = Post.objects.for_feed().get(group__isnull=True)
+        post.snippet = "до {}совпадения{} после".format(search.MARK_START,
+                                                         search.MARK_END)
+        self.assert_same_card(post)
+
+    def test_templates_benchmark(self):
+        results = benchmark.compare_templates(requests=2)
+        self.assertEqual(len(results), len(settings.TEMPLATE_PROFILES)
+                         * len(benchmark.CARD_TEMPLATES))
+        for result in results.values():
+            self.assertEqual(result["posts"], 2)
@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN")
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+        cls.group = Group.objects.create(
+            title="Peck",
+            slug="mafia-town",
+            description="Revoluton"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(25):
+            post = Post.objects.create(
+                text="test" + str(i),
+                author=cls.author,
+                group=cls.group
+            )
+        for i in range(3):
+            Comment.objects.create(post=post, author=cls.reader, text="c")
+        cls.post = post
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        for query in context.captured_queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+            for step in self.explain(query["sql"]):
+                with self.subTest(url=url, sql=query["sql"], step=step):
+                    self.assertNotIn("TEMP B-TREE", step)
+                    self.assertFalse(
+                        step.startswith("SCAN") and "USING" not in step,
+                        "Полный просмотр таблицы"
+                    )
+        return response
+
+    def assert_feed_indexed(self, url):
+        page = self.assert_indexed(url).context["page"]
+        page = self.assert_indexed(url + "?cursor=" + page.next_cursor)
+        self.assert_indexed(url + "?cursor=" + page.context["page"]
+                            .previous_cursor)
+
+    def test_feeds(self):
+        urls = [
+            reverse("index"),
+            reverse("group", kwargs={"slug": "mafia-town"}),
+            reverse("profile", kwargs={"username": "author"}),
+            reverse("follow_index"),
+        ]
+        for url in urls:
+            self.assert_feed_indexed(url)
+
+    @mock.patch("posts.timeline.FANOUT_MAX_FOLLOWERS", 0)
+    def test_follow_feed_with_popular_author(self):
+        self.assert_feed_indexed(reverse("follow_index"))
+
+    def test_post(self):
+        post = QueryPlanTest.post
+        self.assert_indexed(reverse("post", kwargs={
+            "username": "author",
+            "post_id": post.pk
+        }))
+
+    @mock.patch("posts.views.COMMENTS_PAGE_SIZE", 2)
+    def test_comment_thread(self):
+        post = QueryPlanTest.post
+        response = self.assert_indexed(reverse("post", kwargs={
+            "username": "author",
+            "post_id": post.pk
+        }))
+        self.assert_indexed(reverse("post_comments", kwargs={
+            "username": "author",
+            "post_id": post.pk
+        }) + "?cursor=" + response.context["comments_cursor"])
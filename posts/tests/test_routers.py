@@ -0,0 +1,129 @@
+import copy
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from yatube import routers
+
+
+class RouterTest(TestCase):
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+        self.router = routers.PrimaryReplicaRouter()
+
+    def run_view(self, view, request):
+        seen = {}
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            seen["alias"] = self.router.db_for_read(Post)
+            seen["user"] = self.router.db_for_read(get_user_model())
+            return HttpResponse()
+
+        middleware = routers.ReplicaMiddleware(get_response)
+        response = middleware(request)
+        return seen, response
+
+    @override_settings(DATABASE_REPLICAS=["reader"])
+    def test_read_only_view_uses_replica(self):
+        view = routers.read_replica(lambda request: None)
+        seen, _ = self.run_view(view, self.factory.get("/"))
+        self.assertEqual(seen["alias"], "reader")
+        self.assertEqual(seen["user"], "default")
+        self.assertEqual(self.router.db_for_read(Post), "default")
+
+    @override_settings(DATABASE_REPLICAS=["reader"])
+    def test_other_views_and_writes_use_primary(self):
+        view = routers.read_replica(lambda request: None)
+        requests = [
+            (lambda request: None, self.factory.get("/")),
+            (view, self.factory.post("/")),
+        ]
+        sticky = self.factory.get("/")
+        sticky.COOKIES[routers.STICKY_COOKIE] = "1"
+        requests.append((view, sticky))
+        for view_func, request in requests:
+            with self.subTest(method=request.method):
+                seen, _ = self.run_view(view_func, request)
+                self.assertEqual(seen["alias"], "default")
+        self.assertEqual(self.router.db_for_write(Post), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        view = routers.read_replica(lambda request: None)
+        seen, _ = self.run_view(view, self.factory.get("/"))
+        self.assertEqual(seen["alias"], "default")
+
+    @unittest.skipUnless("replica" in connections, "нет реплики")
+    def test_test_mirror_reads_through_primary(self):
+        self.assertEqual(routers.resolve_mirror("replica"), "default")
+        self.assertEqual(routers.resolve_mirror("reader"), "reader")
+
+    def test_write_makes_user_sticky(self):
+        author = get_user_model().objects.create(username="author")
+        client = Client()
+        client.force_login(author)
+        response = client.get(reverse("index"))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        response = client.post(reverse("new_post"), {"text": "текст"})
+        self.assertEqual(
+            response.cookies[routers.STICKY_COOKIE]["max-age"],
+            settings.REPLICA_STICKY_SECONDS
+        )
+
+
+@unittest.skipUnless("replica" in connections,
+                     "YATUBE_DATABASE=replica: второй файл SQLite")
+class ReplicaDatabaseTest(TestCase):
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # В тестах реплика - зеркало default, а здесь нужно видеть,
+        # откуда читали: на время класса у неё своя база в памяти
+        cls.mirror = connections["replica"]
+        settings_dict = copy.deepcopy(connections["default"].settings_dict)
+        settings_dict["NAME"] = (
+            "file:memorydb_replica?mode=memory&cache=shared"
+        )
+        settings_dict["TEST"]["MIRROR"] = None
+        connections["replica"] = cls.mirror.__class__(settings_dict,
+                                                      "replica")
+        call_command("migrate", database="replica", verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        connections["replica"].close()
+        connections["replica"] = cls.mirror
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.author = get_user_model().objects.create(username="author")
+        # В реплике свой пользователь и пост: по ним видно, откуда читали
+        get_user_model().objects.using("replica").create(
+            pk=self.author.pk, username="author"
+        )
+        Post.objects.using("replica").create(text="с реплики",
+                                             author_id=self.author.pk)
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_reads_from_replica_until_write(self):
+        self.assertEqual(routers.resolve_mirror("replica"), "replica")
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "с реплики")
+        self.client.post(reverse("new_post"), {"text": "с primary"})
+        cache.clear()
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "с primary")
+        self.assertNotContains(response, "с реплики")
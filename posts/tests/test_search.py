@@ -0,0 +1,101 @@
+import unittest
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "FTS5")
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+
+    def find(self, text, **params):
+        response = self.guest_client.get(reverse("search"),
+                                         {"q": text, **params})
+        return response.context["page"]
+
+    def test_build_query(self):
+        self.assertEqual(search.build_query('Кот "OR" пёс'),
+                         '"кот"* "or"* "пёс"*')
+        self.assertEqual(search.build_query("  ,. "), "")
+
+    def test_finds_posts_and_comments(self):
+        post = Post.objects.create(text="Рыжий кот спит",
+                                   author=self.author)
+        other = Post.objects.create(text="Про собак", author=self.author)
+        Comment.objects.create(post=other, author=self.author,
+                               text="а кот лучше")
+        Post.objects.create(text="Про погоду", author=self.author)
+        self.assertEqual(list(self.find("кот")), [post, other])
+        self.assertEqual(list(self.find("рыж")), [post])
+        self.assertEqual(list(self.find("")), [])
+
+    def test_index_follows_changes(self):
+        post = Post.objects.create(text="старый текст", author=self.author)
+        post.text = "новый текст"
+        post.save()
+        self.assertEqual(list(self.find("старый")), [])
+        self.assertEqual(list(self.find("новый")), [post])
+        comment = Comment.objects.create(post=post, author=self.author,
+                                         text="комментарий")
+        self.assertEqual(list(self.find("комментарий")), [post])
+        comment.delete()
+        self.assertEqual(list(self.find("комментарий")), [])
+        post.delete()
+        self.assertEqual(list(self.find("новый")), [])
+
+    def test_post_with_several_matching_rows_found_once(self):
+        post = Post.objects.create(text="кот", author=self.author)
+        for text in ("кот", "ещё кот", "и кот"):
+            Comment.objects.create(post=post, author=self.author, text=text)
+        page = self.find("кот")
+        self.assertEqual(list(page), [post])
+        # Совпадение в тексте поста весит больше, сниппет - из него
+        self.assertEqual(page[0].snippet,
+                         search.MARK_START + "кот" + search.MARK_END)
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        Post.objects.create(text="<b>жирный</b> кот", author=self.author)
+        response = self.guest_client.get(reverse("search"), {"q": "кот"})
+        self.assertContains(response, "&lt;b&gt;жирный&lt;/b&gt; "
+                                      "<mark>кот</mark>")
+
+    def test_cursor_pagination(self):
+        posts = [
+            Post.objects.create(text="кот " * (i + 1), author=self.author)
+            for i in range(15)
+        ]
+        first = self.find("кот")
+        self.assertEqual(len(first), 10)
+        second = self.find("кот", cursor=first.next_cursor)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(set(first) | set(second), set(posts))
+        back = self.find("кот", cursor=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_rebuild(self):
+        Post.objects.create(text="кот", author=self.author)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM posts_search")
+        self.assertEqual(list(self.find("кот")), [])
+        post = Post.objects.get()
+        Comment.objects.create(post=post, author=self.author, text="кот")
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM posts_search")
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(list(self.find("кот")), [post])
+        self.assertEqual(post.search_documents.count(), 2)
@@ -0,0 +1,29 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from yatube.sqlite import configure_sqlite
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Прагмы SQLite")
+class SqlitePragmasTest(TestCase):
+    def pragma(self, name):
+        return connection.connection.execute(
+            "PRAGMA {}".format(name)
+        ).fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        cache_size = self.pragma("cache_size")
+        self.addCleanup(connection.connection.execute,
+                        "PRAGMA cache_size = {}".format(cache_size))
+        with override_settings(SQLITE_PRAGMAS={"cache_size": -1234}):
+            with self.assertNumQueries(0):
+                configure_sqlite(sender=None, connection=connection)
+        self.assertEqual(self.pragma("cache_size"), -1234)
+
+    def test_default_profile_changes_nothing(self):
+        cache_size = self.pragma("cache_size")
+        with override_settings(SQLITE_PRAGMAS={}):
+            configure_sqlite(sender=None, connection=connection)
+        self.assertEqual(self.pragma("cache_size"), cache_size)
@@ -0,0 +1,107 @@
+import unittest
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, Suggestion
+
+GRAPH = {
+    "alice": ["bob", "carol"],
+    "bob": ["dave"],
+    "carol": ["dave", "erin"],
+    "frank": ["bob", "gina"],
+}
+
+
+class SuggestionsTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        names = set(GRAPH) | {a for authors in GRAPH.values() for a in authors}
+        self.users = {
+            name: get_user_model().objects.create(username=name)
+            for name in sorted(names)
+        }
+        Follow.objects.bulk_create([
+            Follow(user=self.users[user], author=self.users[author])
+            for user, authors in GRAPH.items() for author in authors
+        ])
+
+    def ranked(self, name):
+        return list(Suggestion.objects.filter(
+            user=self.users[name]
+        ).order_by("-score", "author").values_list("author__username",
+                                                   "score"))
+
+    def test_friends_of_friends_and_co_follows(self):
+        self.assertEqual(suggestions.build(), len(GRAPH))
+        # dave - у двух друзей, erin - у одного, gina - у читателя,
+        # тоже подписанного на bob
+        self.assertEqual(self.ranked("alice"),
+                         [("dave", 4.0), ("erin", 2.0), ("gina", 1.0)])
+        suggested = Suggestion.objects.filter(user=self.users["frank"])
+        self.assertNotIn(self.users["frank"].pk,
+                         suggested.values_list("author_id", flat=True))
+        self.assertNotIn(self.users["bob"].pk,
+                         suggested.values_list("author_id", flat=True))
+
+    def test_top_k(self):
+        suggestions.build(k=1)
+        self.assertEqual(self.ranked("alice"), [("dave", 4.0)])
+
+    @unittest.skipIf(suggestions.sparse is None, "нет SciPy")
+    def test_engines_agree(self):
+        graph = suggestions.load_graph()
+        user_ids = sorted(self.users[name].pk for name in self.users)
+        self.assertEqual(
+            list(suggestions.score_sparse(graph, user_ids, 20,
+                                          batch_size=3)),
+            list(suggestions.score_python(graph, user_ids, 20))
+        )
+
+    def test_follow_marks_stale_and_drops_suggestion(self):
+        suggestions.build()
+        self.assertEqual(suggestions.stale_users(), [])
+        alice = self.users["alice"]
+        # Запрос подписки только убирает автора из рекомендаций
+        with self.assertNumQueries(1):
+            suggestions.follow_changed(alice.pk, self.users["dave"].pk)
+        Follow.objects.create(user=alice, author=self.users["dave"])
+        self.assertEqual(self.ranked("alice"),
+                         [("erin", 2.0), ("gina", 1.0)])
+        # Пересчёт нужен erin и её читателю carol
+        Follow.objects.create(user=self.users["erin"], author=alice)
+        self.assertEqual(
+            suggestions.stale_users(),
+            sorted(self.users[name].pk for name in ("alice", "carol", "erin"))
+        )
+        call_command("build_suggestions", "--stale", stdout=StringIO())
+        self.assertEqual(suggestions.stale_users(), [])
+        self.assertIn(("carol", 2.0), self.ranked("erin"))
+
+    def test_unfollow_all_marks_stale(self):
+        suggestions.build()
+        Follow.objects.filter(user=self.users["bob"]).delete()
+        self.assertEqual(
+            suggestions.stale_users(),
+            sorted(self.users[name].pk for name in ("alice", "bob", "frank"))
+        )
+        suggestions.build(stale=True)
+        self.assertEqual(self.ranked("bob"), [])
+
+    def test_pages_show_suggestions(self):
+        suggestions.build()
+        client = Client()
+        client.force_login(self.users["alice"])
+        for url in (reverse("profile", args=["bob"]),
+                    reverse("follow_index")):
+            response = client.get(url)
+            self.assertContains(response, "Кого почитать")
+            self.assertContains(response,
+                                reverse("profile_follow", args=["erin"]))
+        response = Client().get(reverse("profile", args=["bob"]))
+        self.assertNotContains(response, "Кого почитать")
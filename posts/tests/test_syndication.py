@@ -0,0 +1,100 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        for i in range(25):
+            Post.objects.create(text="пост <{}> & текст".format(i),
+                                author=cls.author, group=cls.group)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+
+    def urls(self, fmt):
+        return [
+            reverse("index_feed", kwargs={"fmt": fmt}),
+            reverse("group_feed", kwargs={"slug": "group", "fmt": fmt}),
+            reverse("profile_feed", kwargs={"username": "author",
+                                            "fmt": fmt}),
+        ]
+
+    def get(self, url, **extra):
+        response = self.guest_client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_rss(self):
+        for url in self.urls("rss"):
+            with self.subTest(url=url):
+                channel = ElementTree.fromstring(self.get(url)).find("channel")
+                items = channel.findall("item")
+                self.assertEqual(len(items), 20)
+                self.assertEqual(items[0].find("description").text,
+                                 "пост <24> & текст")
+
+    def test_atom(self):
+        for url in self.urls("atom"):
+            with self.subTest(url=url):
+                feed = ElementTree.fromstring(self.get(url))
+                self.assertEqual(len(feed.findall(ATOM + "entry")), 20)
+                links = {
+                    link.get("rel"): link.get("href")
+                    for link in feed.findall(ATOM + "link")
+                }
+                self.assertIn("next", links)
+
+    def test_json_pagination(self):
+        for url in self.urls("json"):
+            with self.subTest(url=url):
+                first = json.loads(self.get(url))
+                self.assertEqual(first["version"],
+                                 "https://jsonfeed.org/version/1.1")
+                second = json.loads(self.get(first["next_url"]))
+                self.assertNotIn("next_url", second)
+                texts = [item["content_text"]
+                         for item in first["items"] + second["items"]]
+                self.assertEqual(
+                    texts,
+                    ["пост <{}> & текст".format(i) for i in range(24, -1, -1)]
+                )
+
+    def test_not_modified(self):
+        url = reverse("index_feed", kwargs={"fmt": "rss"})
+        etag = self.guest_client.get(url)["ETag"]
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text="новый", author=self.author)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_queries(self):
+        url = reverse("index_feed", kwargs={"fmt": "atom"})
+        with self.assertNumQueries(1):
+            self.get(url)
+
+    def test_unknown(self):
+        urls = [
+            reverse("group_feed", kwargs={"slug": "nope", "fmt": "rss"}),
+            reverse("profile_feed", kwargs={"username": "nope",
+                                            "fmt": "rss"}),
+            "/feed/xml/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name="small.png", size=(50, 20)):
+    buffer = BytesIO()
+    Image.new("RGBA", size=size, color=(255, 0, 0)).save(buffer, "png")
+    return SimpleUploadedFile(
+        name=name,
+        content=buffer.getvalue(),
+        content_type="image/png"
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username="test")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Фоновые задачи не должны писать после удаления каталога
+        thumbnails.shutdown()
+        self.addCleanup(thumbnails.shutdown)
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ThumbnailsTest.user)
+
+    def test_generate_thumbnails(self):
+        post = Post.objects.create(
+            text="test",
+            author=ThumbnailsTest.user,
+            image=make_image()
+        )
+        generate_thumbnails(post.pk)
+        post.refresh_from_db()
+        for field, size in (("image_thumb", (960, 339)),
+                            ("image_preview", (320, 113))):
+            with self.subTest(field=field):
+                with default_storage.open(getattr(post, field)) as thumb:
+                    self.assertEqual(Image.open(thumb).size, size)
+        response = self.authorized_client.get(reverse("index"))
+        self.assertContains(response, post.thumb_url)
+
+    def test_feed_falls_back_to_original_image(self):
+        post = Post.objects.create(
+            text="test",
+            author=ThumbnailsTest.user,
+            image=make_image()
+        )
+        response = self.authorized_client.get(reverse("index"))
+        self.assertContains(response, post.image.url)
+
+    def test_new_post_schedules_thumbnails(self):
+        with mock.patch("posts.thumbnails.schedule") as schedule:
+            self.authorized_client.post(reverse("new_post"), data={
+                "text": "test",
+                "image": make_image(),
+            })
+        schedule.assert_called_once_with(Post.objects.get(text="test"))
+
+    def test_edit_resets_thumbnails(self):
+        post = Post.objects.create(
+            text="test",
+            author=ThumbnailsTest.user,
+            image=make_image("a.png")
+        )
+        generate_thumbnails(post.pk)
+        with mock.patch("posts.thumbnails.schedule") as schedule:
+            self.authorized_client.post(
+                reverse("post_edit", args=["test", post.pk]),
+                data={"text": "test", "image": make_image("b.png")}
+            )
+        post.refresh_from_db()
+        schedule.assert_called_once_with(post)
+        self.assertEqual((post.image_thumb, post.image_preview), ("", ""))
+        self.assertEqual(post.thumb_url, post.image.url)
+        self.assertIn("b", post.image.name)
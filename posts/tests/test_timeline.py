@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse("follow_index"))
+        return [post.text for post in response.context.get("page")]
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="fresh", author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader,
+            post=post
+        ).exists())
+        self.assertEqual(self.feed(), ["fresh"])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Post.objects.create(text="old", author=self.author)
+        self.authorized_client.get(
+            reverse("profile_follow", kwargs={"username": "author"})
+        )
+        self.assertEqual(self.feed(), ["old"])
+        self.authorized_client.get(
+            reverse("profile_unfollow", kwargs={"username": "author"})
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [])
+
+    @mock.patch("posts.timeline.FANOUT_MAX_FOLLOWERS", 0)
+    def test_popular_author_is_merged_on_read(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text="popular", author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), ["popular"])
+
+    def test_author_crossing_threshold_up_is_not_duplicated(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text="p1", author=self.author)
+        with mock.patch("posts.timeline.FANOUT_MAX_FOLLOWERS", 0):
+            Post.objects.create(text="p2", author=self.author)
+            # Строка p1 осталась в инбоксе, p1 и p2 приходят при чтении
+            self.assertEqual(TimelineEntry.objects.count(), 1)
+            self.assertEqual(self.feed(), ["p2", "p1"])
+
+    @mock.patch("posts.timeline.FANOUT_MAX_FOLLOWERS", 1)
+    def test_author_crossing_threshold_down_is_backfilled(self):
+        other = get_user_model().objects.create(username="other")
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        Post.objects.create(text="popular", author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), ["popular"])
+
+        with mock.patch("posts.timeline.schedule_backfill") as schedule:
+            Follow.objects.get(user=other).delete()
+        schedule.assert_called_once_with(self.author.pk)
+        # В запросе отписки ленты не дописываются
+        self.assertFalse(TimelineEntry.objects.exists())
+        timeline.backfill_followers(self.author.pk)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post__text="popular"
+        ).exists())
+        self.assertEqual(self.feed(), ["popular"])
+
+    @mock.patch("posts.timeline.FANOUT_MAX_FOLLOWERS", 0)
+    def test_popular_authors_read_in_one_query(self):
+        others = [
+            get_user_model().objects.create(username="other{}".format(i))
+            for i in range(3)
+        ]
+        for author in [self.author] + others:
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(text=author.username, author=author)
+        paginator = timeline.TimelinePaginator(self.reader, 10)
+        # Список популярных авторов, инбокс, их посты одним запросом
+        with self.assertNumQueries(3):
+            page = paginator.page(None)
+            self.assertEqual(len(page.object_list), 4)
+
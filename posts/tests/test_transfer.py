@@ -0,0 +1,123 @@
+import datetime as dt
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post, TimelineEntry, UserStats
+from posts.transfer import Importer, read_rows
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.reader = get_user_model().objects.create(username="reader")
+        cls.group = Group.objects.create(title="group", slug="group")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def roundtrip(self, name):
+        # У каждого поста своя дата: видно, что она досталась своей строке
+        now = timezone.now().replace(microsecond=0)
+        pub_dates = {
+            "пост, \"{}\"\nстрока".format(i): now - dt.timedelta(days=i)
+            for i in range(5)
+        }
+        for text, pub_date in pub_dates.items():
+            post = Post.objects.create(text=text, author=self.author,
+                                       group=self.group)
+            Post.objects.filter(pk=post.pk).update(pub_date=pub_date)
+        call_command("export_posts", self.path(name), stderr=StringIO())
+        Post.objects.all().delete()
+        call_command("import_posts", self.path(name), batch_size=2,
+                     stdout=StringIO())
+        return pub_dates
+
+    def test_roundtrip(self):
+        for name in ("posts.jsonl", "posts.csv"):
+            with self.subTest(name=name):
+                Post.objects.all().delete()
+                pub_dates = self.roundtrip(name)
+                self.assertEqual(
+                    dict(Post.objects.values_list("text", "pub_date")),
+                    pub_dates
+                )
+                self.assertFalse(Post.objects.exclude(
+                    author=self.author, group=self.group
+                ).exists())
+
+    def test_import_updates_denormalized_data(self):
+        self.roundtrip("posts.jsonl")
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         5)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader)
+                         .count(), 5)
+        response = self.client.get("/search/", {"q": "строка"})
+        self.assertEqual(len(response.context["page"]), 5)
+
+    def test_lookups_are_cached(self):
+        with open(self.path("posts.jsonl"), "w") as stream:
+            for i in range(20):
+                stream.write('{"text": "t", "author": "author", '
+                             '"group": "group"}\n')
+        importer = Importer(batch_size=100)
+        with self.assertNumQueries(2):
+            with open(self.path("posts.jsonl")) as stream:
+                for number, row in enumerate(read_rows(stream, "jsonl")):
+                    importer.build(number, row)
+
+    def test_unknown_references(self):
+        with open(self.path("posts.csv"), "w") as stream:
+            stream.write("text,author,group\n"
+                         "a,author,\n"
+                         "b,stranger,\n"
+                         "c,author,nowhere\n")
+        out = StringIO()
+        call_command("import_posts", self.path("posts.csv"), stdout=out)
+        self.assertIn("Загружено постов: 1, пропущено: 2", out.getvalue())
+        call_command("import_posts", self.path("posts.csv"),
+                     create_missing=True, stdout=out)
+        self.assertTrue(Post.objects.filter(author__username="stranger")
+                        .exists())
+        self.assertTrue(Post.objects.filter(group__slug="nowhere").exists())
+
+    def test_bad_date(self):
+        with open(self.path("posts.jsonl"), "w") as stream:
+            stream.write('{"text": "t", "author": "author", '
+                         '"pub_date": "вчера"}\n')
+        with self.assertRaises(CommandError):
+            call_command("import_posts", self.path("posts.jsonl"),
+                         stdout=StringIO())
+
+    def test_failed_import_keeps_denormalized_data(self):
+        with open(self.path("posts.jsonl"), "w") as stream:
+            for i in range(3):
+                stream.write('{"text": "строка", "author": "author"}\n')
+            stream.write('{"text": "t", "author": "author", '
+                         '"pub_date": "вчера"}\n')
+        with self.assertRaises(CommandError):
+            call_command("import_posts", self.path("posts.jsonl"),
+                         batch_size=2, stdout=StringIO())
+        # Первая пачка вставлена до ошибки, третий пост - уже нет
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         2)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader)
+                         .count(), 2)
+        response = self.client.get("/search/", {"q": "строка"})
+        self.assertEqual(len(response.context["page"]), 2)
@@ -0,0 +1,124 @@
+import datetime as dt
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Group, Post, PostActivity
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.group = Group.objects.create(title="Группа", slug="group",
+                                         description="")
+        cls.other_group = Group.objects.create(title="Другая", slug="other",
+                                               description="")
+        cls.posts = [
+            Post.objects.create(text="пост {}".format(i), author=cls.author,
+                                group=group)
+            for i, group in enumerate((cls.group, cls.group,
+                                       cls.other_group, None))
+        ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock.patch("posts.trending.start_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Счётчики от других тестов
+        trending.ring.drain()
+
+    def test_flush_adds_to_hourly_bucket(self):
+        first, second = self.posts[:2]
+        trending.record_view(first.pk)
+        trending.record_view(first.pk)
+        trending.record_comments(second.pk, 3)
+        trending.flush()
+        trending.record_view(first.pk)
+        trending.flush()
+        activity = {
+            row.post_id: row for row in PostActivity.objects.all()
+        }
+        self.assertEqual(len(activity), 2)
+        self.assertEqual(activity[first.pk].views, 3)
+        self.assertEqual(activity[second.pk].comments, 3)
+        self.assertEqual(activity[second.pk].group_id, self.group.pk)
+        self.assertEqual(activity[first.pk].hour.minute, 0)
+
+    def test_minutes_of_one_hour_share_bucket(self):
+        ring = trending.Ring(size=3)
+        hour = 1600000000 // 3600 * 3600
+        for offset in (0, 60, 120, 180):
+            with mock.patch("posts.trending.time.time",
+                            return_value=hour + offset):
+                ring.add(1, trending.VIEWS)
+        # Четвёртая минута заняла слот первой, кольцо не растёт
+        self.assertEqual(dict(ring.drain()), {
+            (1, trending.hour_of(hour // 60)): [0, 3]
+        })
+        self.assertEqual(ring.drain(), {})
+
+    def test_lists_rank_by_weighted_score(self):
+        first, second, third, ungrouped = self.posts
+        for _ in range(4):
+            trending.record_view(first.pk)
+        trending.record_comments(second.pk)
+        trending.record_view(third.pk)
+        trending.record_view(ungrouped.pk)
+        trending.flush()
+        self.assertEqual(
+            [post.pk for post in trending.top_posts()],
+            [second.pk, first.pk, third.pk, ungrouped.pk]
+        )
+        self.assertEqual(trending.top_groups(),
+                         [self.group, self.other_group])
+        self.assertEqual(trending.group_posts(self.group), [second, first])
+
+        # Через сутки окно пустое, старые корзины удалены
+        trending.refresh(timezone.now() + dt.timedelta(days=1))
+        self.assertFalse(PostActivity.objects.exists())
+        self.assertEqual(trending.top_posts(), [])
+        self.assertEqual(trending.group_posts(self.group), [])
+
+    def test_moved_post_is_counted_once_in_its_group(self):
+        post = self.posts[0]
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        PostActivity.objects.create(post=post, group=self.group, views=3,
+                                    hour=hour - dt.timedelta(hours=1))
+        Post.objects.filter(pk=post.pk).update(group=self.other_group)
+        PostActivity.objects.create(post=post, group=self.other_group,
+                                    views=2, hour=hour)
+        lists = trending.refresh()
+        self.assertEqual(lists[trending.POSTS_KEY], [(post.pk, 5)])
+        self.assertEqual(lists[trending.GROUPS_KEY],
+                         [(self.other_group.pk, 5)])
+        self.assertNotIn(trending.group_key(self.group.pk), lists)
+
+    def test_views_and_comments_are_recorded(self):
+        post = self.posts[0]
+        client = Client()
+        client.get(reverse("post", args=["author", post.pk]))
+        Comment.objects.create(post=post, author=self.author, text="ого")
+        trending.flush()
+        activity = PostActivity.objects.get(post=post)
+        self.assertEqual((activity.views, activity.comments), (1, 1))
+
+    def test_pages_read_precomputed_lists(self):
+        trending.record_comments(self.posts[1].pk)
+        trending.flush()
+        client = Client()
+        with self.assertNumQueries(2):
+            response = client.get(reverse("trending"))
+        self.assertContains(response, "пост 1")
+        self.assertContains(response, reverse("group", args=["group"]))
+        response = client.get(reverse("group", args=["group"]))
+        self.assertContains(response, "Популярное в сообществе")
+        response = client.get(reverse("group", args=["other"]))
+        self.assertNotContains(response, "Популярное в сообществе")
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Post, PostActivity
+
+
+class ViewCountsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = get_user_model().objects.create(username="author")
+        cls.posts = [
+            Post.objects.create(text="пост {}".format(i), author=cls.author)
+            for i in range(3)
+        ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        patcher = mock.patch("posts.trending.start_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Просмотры от других тестов
+        trending.ring.drain()
+
+    def counts(self):
+        return dict(Post.objects.values_list("pk", "view_count"))
+
+    def view_count_updates(self, queries):
+        return sum('SET "view_count"' in query["sql"]
+                   for query in queries.captured_queries)
+
+    def test_views_written_in_one_update(self):
+        first, second, third = self.posts
+        client = Client()
+        for post in (first, first, second):
+            client.get(reverse("post", args=["author", post.pk]))
+        self.assertEqual(set(self.counts().values()), {0})
+        with CaptureQueriesContext(connection) as queries:
+            trending.write(trending.ring.drain())
+        self.assertEqual(self.view_count_updates(queries), 1)
+        self.assertEqual(self.counts(), {first.pk: 2, second.pk: 1,
+                                         third.pk: 0})
+
+    def test_not_modified_is_counted(self):
+        post = self.posts[0]
+        client = Client()
+        url = reverse("post", args=["author", post.pk])
+        etag = client.get(url)["ETag"]
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        client.get(reverse("post", args=["stranger", post.pk]))
+        trending.flush()
+        # Перенаправление с чужого имени не считается
+        self.assertEqual(self.counts()[post.pk], 2)
+
+    def test_batches(self):
+        for post in self.posts:
+            trending.record_view(post.pk)
+        with mock.patch("posts.trending.VIEW_COUNT_BATCH_SIZE", 2), \
+                CaptureQueriesContext(connection) as queries:
+            trending.write(trending.ring.drain())
+        self.assertEqual(self.view_count_updates(queries), 2)
+        self.assertEqual(set(self.counts().values()), {1})
+
+    def test_failed_flush_keeps_counts(self):
+        post = self.posts[0]
+        trending.record_view(post.pk)
+        with mock.patch("posts.trending.write_view_counts",
+                        side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                trending.flush()
+        trending.record_view(post.pk)
+        trending.flush()
+        self.assertEqual(self.counts()[post.pk], 2)
+        self.assertEqual(PostActivity.objects.get(post=post).views, 2)
+
+    def test_shutdown_flushes_views(self):
+        post = self.posts[0]
+        trending.record_view(post.pk)
+        trending.flush_on_exit(connection.settings_dict["NAME"])
+        self.assertEqual(self.counts()[post.pk], 1)
+        # Другой базе чужие счётчики не достаются
+        trending.record_view(post.pk)
+        trending.flush_on_exit("other.sqlite3")
+        self.assertEqual(self.counts()[post.pk], 1)
+
+    def test_pages_show_stored_count(self):
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(view_count=5)
+        client = Client()
+        response = client.get(reverse("post", args=["author", post.pk]))
+        self.assertContains(response, "Просмотров: 5")
+        response = client.get(reverse("index"))
+        self.assertContains(response, "Просмотров: 5", count=1)
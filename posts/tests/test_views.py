@@ -1,4 +1,5 @@
 import datetime as dt
+from unittest import mock
 from django.core.cache import cache
 import shutil
 import tempfile
@@ -233,11 +234,17 @@ class ViewsTest(TestCase):
                 self.assertEqual(post_text_0, expected)
 
     def test_index_cached(self):
+        url = reverse("index")
+        self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertContains(response, "test")
+
+    def test_index_cache_invalidated_on_new_post(self):
         user = ViewsTest.user
         url = reverse("index")
-        client = self.authorized_client
-        response = client.get(url)
-        post_content_before = response.content
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, "cache")
         Post.objects.create(
             text="cache",
             pub_date=dt.date.today(),
@@ -245,13 +252,27 @@ class ViewsTest(TestCase):
             group=Group.objects.first(),
             image=None
         )
-        response = client.get(url)
-        post_content_cached = response.content
-        cache.clear()
-        response = client.get(url)
-        post_content_after = response.content
-        self.assertEqual(post_content_before, post_content_cached)
-        self.assertNotEqual(post_content_cached, post_content_after)
+        response = self.authorized_client.get(url)
+        self.assertContains(response, "cache")
+
+    def test_index_cache_is_page_aware(self):
+        user = ViewsTest.user
+        for i in range(10):
+            Post.objects.create(text="page" + str(i), author=user)
+        first = self.guest_client.get(reverse("index"))
+        second = self.guest_client.get(
+            reverse("index") + "?cursor=" + first.context["page"].next_cursor
+        )
+        self.assertContains(first, "page9")
+        self.assertNotContains(second, "page9")
+        self.assertContains(second, "post_{}".format(ViewsTest.post.pk))
+
+    def test_index_cache_shared_between_users(self):
+        url = reverse("index")
+        self.guest_client.get(url)
+        with self.assertNumQueries(2):
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'data-author="test"')
 
     def test_authrized_follow(self):
         follow = Follow.objects.count()
@@ -316,3 +337,123 @@ class ViewsTest(TestCase):
             post=Post.objects.first()
         ).count()
         self.assertEqual(comments_new_guest, comments)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username="test")
+        cls.group = Group.objects.create(
+            title="Peck",
+            slug="mafia-town",
+            description="Revoluton"
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text="test" + str(i),
+                author=FeedQueriesTest.user,
+                group=FeedQueriesTest.group
+            )
+            Comment.objects.create(
+                post=post,
+                author=FeedQueriesTest.user,
+                text="comment"
+            )
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        urls = {
+            reverse("index"): 1,
+            reverse("group", kwargs={"slug": "mafia-town"}): 2,
+        }
+        for posts_count in (1, 10):
+            self.create_posts(posts_count)
+            for url, queries in urls.items():
+                with self.subTest(url=url, posts_count=posts_count):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        self.guest_client.get(url)
+
+    def test_feed_shows_comment_count(self):
+        self.create_posts(1)
+        response = self.guest_client.get(reverse("index"))
+        self.assertEqual(response.context.get("page")[0].comment_count, 1)
+        self.assertContains(response, "Комментариев: 1")
+
+    def test_post_page_query_count(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        url = reverse("post", kwargs={"username": "test", "post_id": post.pk})
+        # Пост с автором и группой, затем страница комментариев
+        with self.assertNumQueries(2):
+            self.guest_client.get(url)
+
+    def test_wrong_username_redirects_with_one_query(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        get_user_model().objects.create(username="other")
+        url = reverse("post", kwargs={"username": "other",
+                                      "post_id": post.pk})
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url)
+        self.assertRedirects(response, reverse("post", kwargs={
+            "username": "test", "post_id": post.pk
+        }))
+
+
+@mock.patch("posts.views.COMMENTS_PAGE_SIZE", 2)
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username="test")
+        cls.post = Post.objects.create(text="test", author=cls.user)
+        for i in range(5):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text="comment" + str(i))
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.kwargs = {"username": "test", "post_id": self.post.pk}
+
+    def test_post_page_renders_first_comments(self):
+        response = self.guest_client.get(reverse("post", kwargs=self.kwargs))
+        self.assertContains(response, "comment1")
+        self.assertNotContains(response, "comment2")
+        self.assertContains(response, reverse("post_comments",
+                                              kwargs=self.kwargs))
+
+    def test_fragment_loads_rest_of_thread(self):
+        cursor = self.guest_client.get(
+            reverse("post", kwargs=self.kwargs)
+        ).context["comments_cursor"]
+        url = reverse("post_comments", kwargs=self.kwargs)
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(url, {"cursor": cursor})
+        self.assertTemplateUsed(response, "comments_page.html")
+        self.assertContains(response, "comment3")
+        self.assertNotContains(response, "comment1")
+
+        data = self.guest_client.get(url, {
+            "cursor": response.context["comments_cursor"],
+            "format": "json"
+        }).json()
+        self.assertEqual([item["text"] for item in data["comments"]],
+                         ["comment4"])
+        self.assertIsNone(data["next_cursor"])
+
+    def test_fragment_errors(self):
+        url = reverse("post_comments", kwargs=self.kwargs)
+        response = self.guest_client.get(url, {"cursor": "мусор"})
+        self.assertEqual(response.status_code, 400)
+        response = self.guest_client.get(reverse("post_comments", kwargs={
+            "username": "other", "post_id": self.post.pk
+        }))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .feed_cache import bump_feed_version, bump_scopes, post_scopes
+from .models import Post
+from .settings import THUMBNAIL_QUALITY, THUMBNAIL_SIZES, THUMBNAIL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails"
+            )
+        return _executor
+
+
+def shutdown():
+    """Дожидается поставленных задач и останавливает воркеры."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def render_variant(image, size):
+    # То же, что crop="center" upscale=True в sorl-thumbnail
+    variant = ImageOps.fit(image, size, Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, "JPEG", quality=THUMBNAIL_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def variant_name(post, field):
+    base = os.path.splitext(os.path.basename(post.image.name))[0]
+    return "thumbnails/{}/{}-{}.jpg".format(field, post.pk, base)
+
+
+def generate_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).only("image").first()
+    if post is None:
+        return None
+    paths = dict.fromkeys(THUMBNAIL_SIZES, "")
+    if post.image:
+        with default_storage.open(post.image.name) as source:
+            image = Image.open(source)
+            image = image.convert("RGB")
+        for field, size in THUMBNAIL_SIZES.items():
+            name = variant_name(post, field)
+            default_storage.delete(name)
+            paths[field] = default_storage.save(
+                name, render_variant(image, size)
+            )
+    # Картинку могли заменить, пока работал воркер
+    Post.objects.filter(pk=post_id, image=post.image.name).update(**paths)
+    bump_feed_version()
+    bump_scopes(post_scopes([post_id]))
+    return paths
+
+
+def run(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception("Не удалось создать миниатюры поста %s", post_id)
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+def schedule(post):
+    transaction.on_commit(lambda: get_executor().submit(run, post.pk))
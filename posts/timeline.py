@@ -0,0 +1,183 @@
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import CursorPaginator
+from .settings import (FANOUT_MAX_FOLLOWERS, TIMELINE_BACKFILL_SIZE,
+                       TIMELINE_BATCH_SIZE, TIMELINE_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=TIMELINE_WORKERS,
+                thread_name_prefix="timeline"
+            )
+        return _executor
+
+
+def shutdown():
+    """Дожидается поставленных задач и останавливает воркеры."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def fan_out(post):
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list("user_id", flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids.iterator()),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    if is_celebrity(author_id):
+        return
+    backfill_many([user_id], author_id)
+
+
+def backfill_many(user_ids, author_id):
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        "-pub_date"
+    ).values_list("pk", "pub_date")[:TIMELINE_BACKFILL_SIZE])
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for user_id in user_ids for pk, pub_date in posts),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def follower_removed(author_id):
+    """Автор, у которого подписчиков стало не больше порога, снова
+    раскладывается по лентам. Посты, написанные, пока он был выше
+    порога, в инбоксах отсутствуют - дописываем их всем подписчикам.
+    Это до FANOUT_MAX_FOLLOWERS * TIMELINE_BACKFILL_SIZE строк, поэтому
+    не в запросе отписки, а в фоне после коммита."""
+    if UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=FANOUT_MAX_FOLLOWERS
+    ).exists():
+        schedule_backfill(author_id)
+
+
+def backfill_followers(author_id):
+    # Пока задача ждала, автор мог снова подняться выше порога.
+    # Строки, оставшиеся с прошлого раза, пропускает ignore_conflicts
+    if is_celebrity(author_id):
+        return
+    backfill_many(
+        Follow.objects.filter(author_id=author_id).values_list(
+            "user_id", flat=True
+        ).iterator(),
+        author_id
+    )
+
+
+def run_backfill(author_id):
+    try:
+        backfill_followers(author_id)
+    except Exception:
+        logger.exception("Не удалось дописать ленты подписчиков %s",
+                         author_id)
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+def schedule_backfill(author_id):
+    transaction.on_commit(
+        lambda: get_executor().submit(run_backfill, author_id)
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: материализованный инбокс, к которому при чтении
+    подмешиваются посты авторов, не раскладываемых по лентам.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(
+            Post.objects.for_feed().filter(author__following__user=user),
+            per_page
+        )
+        self.user = user
+
+    def celebrity_ids(self):
+        return list(Follow.objects.filter(
+            user=self.user,
+            author__stats__followers_count__gt=FANOUT_MAX_FOLLOWERS
+        ).values_list("author_id", flat=True))
+
+    def fetch(self, values, backwards):
+        # Посты авторов выше порога берём только из общей таблицы:
+        # в инбоксе могут остаться строки, разложенные до того, как
+        # автор пересёк порог
+        celebrity_ids = self.celebrity_ids()
+        inbox = TimelineEntry.objects.filter(user=self.user)
+        if celebrity_ids:
+            inbox = inbox.exclude(post__author_id__in=celebrity_ids)
+        post_ids = list(self.paginate_queryset(
+            inbox.values_list("post_id", flat=True),
+            values,
+            backwards,
+            ordering=("-pub_date", "-post_id")
+        ))
+        posts = Post.objects.for_feed().in_bulk(post_ids)
+        streams = [[posts[pk] for pk in post_ids if pk in posts]]
+        if celebrity_ids:
+            streams.append(list(self.paginate_queryset(
+                Post.objects.for_feed().filter(author_id__in=celebrity_ids),
+                values,
+                backwards
+            )))
+        merged = heapq.merge(
+            *streams,
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=not backwards
+        )
+        page = []
+        seen = set()
+        for post in merged:
+            if post.pk in seen:
+                continue
+            seen.add(post.pk)
+            page.append(post)
+            if len(page) > self.per_page:
+                break
+        return page
@@ -0,0 +1,198 @@
+import csv
+import json
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, timeline
+from .feed_cache import bump_feed_version, bump_scopes
+from .models import Follow, Group, Post, User, UserStats
+
+FIELDS = ("id", "text", "pub_date", "author", "group", "image")
+FORMATS = ("jsonl", "csv")
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def guess_format(path, default="jsonl"):
+    for name in FORMATS:
+        if path.endswith("." + name):
+            return name
+    return default
+
+
+def read_rows(stream, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def export_rows(chunk_size):
+    return Post.objects.order_by("pk").values_list(
+        "pk", "text", "pub_date", "author__username", "group__slug", "image"
+    ).iterator(chunk_size=chunk_size)
+
+
+def write_rows(stream, fmt, rows):
+    """Пишет посты построчно и возвращает их число."""
+    count = 0
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+    for pk, text, pub_date, author, group, image in rows:
+        row = (pk, text, pub_date.isoformat(), author, group or "",
+               image or "")
+        if writer:
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(dict(zip(FIELDS, row)),
+                                    ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+class Lookup:
+    """Кеш имя -> id: каждый автор и группа ищутся в базе один раз."""
+
+    def __init__(self, queryset, field, create=None):
+        self.queryset = queryset
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def __call__(self, name):
+        if not name:
+            return None
+        if name not in self.ids:
+            pk = self.queryset.filter(**{self.field: name}).values_list(
+                "pk", flat=True
+            ).first()
+            if pk is None and self.create:
+                pk = self.create(name).pk
+            self.ids[name] = pk
+        return self.ids[name]
+
+
+def create_author(username):
+    user = User(username=username)
+    user.set_unusable_password()
+    user.save()
+    return user
+
+
+def create_group(slug):
+    return Group.objects.create(title=slug, slug=slug, description="")
+
+
+class Importer:
+    def __init__(self, batch_size=1000, create_missing=False):
+        self.batch_size = batch_size
+        self.authors = Lookup(User.objects.all(), "username",
+                              create_missing and create_author)
+        self.groups = Lookup(Group.objects.all(), "slug",
+                             create_missing and create_group)
+        self.imported = 0
+        self.skipped = 0
+        self.author_ids = set()
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.imported / elapsed if elapsed else 0
+
+    def build(self, number, row):
+        author_id = self.authors(row.get("author"))
+        group_id = self.groups(row.get("group"))
+        if author_id is None or (row.get("group") and group_id is None):
+            self.skipped += 1
+            return None
+        pub_date = row.get("pub_date") or None
+        if pub_date:
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None:
+                raise InvalidRow(
+                    "Строка {}: некорректная дата".format(number)
+                )
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date, timezone.utc)
+        self.author_ids.add(author_id)
+        return Post(text=row.get("text") or "", author_id=author_id,
+                    group_id=group_id, image=row.get("image") or None,
+                    pub_date=pub_date or timezone.now())
+
+    def insert(self, batch):
+        # auto_now_add ставит время вставки, а при импорте дата
+        # берётся из файла: возвращаем её после вставки
+        pub_dates = [post.pub_date for post in batch]
+        with transaction.atomic():
+            Post.objects.bulk_create(batch)
+            pks = [post.pk for post in batch]
+            if None in pks:
+                # SQLite не возвращает id из bulk_create. Пока транзакция
+                # держит запись, вставленные строки - последние по pk
+                pks = sorted(Post.objects.order_by("-pk").values_list(
+                    "pk", flat=True
+                )[:len(batch)])
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "UPDATE {} SET pub_date = %s WHERE id = %s".format(
+                        Post._meta.db_table
+                    ),
+                    [(connection.ops.adapt_datetimefield_value(pub_date), pk)
+                     for pub_date, pk in zip(pub_dates, pks)]
+                )
+        self.imported += len(batch)
+
+    def run(self, rows, progress=None):
+        last_pk = Post.objects.order_by("-pk").values_list(
+            "pk", flat=True
+        ).first() or 0
+        batch = []
+        # Пачки, вставленные до ошибки, остаются в базе: счётчики,
+        # ленты и индекс догоняем и при прерванном импорте
+        try:
+            for number, row in enumerate(rows, 1):
+                post = self.build(number, row)
+                if post is not None:
+                    batch.append(post)
+                if len(batch) >= self.batch_size:
+                    self.insert(batch)
+                    batch = []
+                    if progress:
+                        progress(self)
+            if batch:
+                self.insert(batch)
+        finally:
+            self.finish(last_pk)
+        return self
+
+    def finish(self, last_pk):
+        # bulk_create не шлёт сигналов: счётчики, ленты подписчиков
+        # и поисковый индекс обновляем сами
+        author_ids = sorted(self.author_ids)
+        with transaction.atomic():
+            for start in range(0, len(author_ids), self.batch_size):
+                batch = author_ids[start:start + self.batch_size]
+                UserStats.objects.recount(User.objects.filter(pk__in=batch))
+                for user_id, author_id in Follow.objects.filter(
+                    author_id__in=batch
+                ).values_list("user_id", "author_id").iterator():
+                    timeline.backfill(user_id, author_id)
+            if search.available():
+                search.index_since(last_pk)
+        bump_feed_version()
+        scopes = ["index"]
+        scopes += ["profile:" + name for name, pk in self.authors.ids.items()
+                   if pk in self.author_ids]
+        scopes += ["group:" + slug for slug, pk in self.groups.ids.items()
+                   if pk is not None]
+        bump_scopes(scopes)
@@ -0,0 +1,302 @@
+"""Популярные посты, группы и счётчики просмотров.
+
+Комментарии и просмотры считаются в памяти процесса в кольце минутных
+слотов, фоновый поток раз в TRENDING_FLUSH_INTERVAL секунд одним
+запросом прибавляет их к почасовым корзинам PostActivity, а просмотры
+ещё и к Post.view_count - одним UPDATE с CASE на VIEW_COUNT_BATCH_SIZE
+постов. После выгрузки по корзинам за TRENDING_WINDOW_HOURS
+пересчитываются списки лучших постов, групп и постов каждой группы.
+Списки лежат в кеше, страницы только читают их и не агрегируют ни
+комментарии, ни корзины.
+"""
+import atexit
+import datetime as dt
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (Case, F, PositiveIntegerField, Sum, Value,
+                              When)
+from django.utils import timezone
+
+from .feed_cache import bump_scopes, post_scopes
+from .models import Group, Post, PostActivity
+from .settings import (TRENDING_CACHE_TIMEOUT, TRENDING_COMMENT_WEIGHT,
+                       TRENDING_FLUSH_INTERVAL, TRENDING_GROUP_SIZE,
+                       TRENDING_RING_MINUTES, TRENDING_SIZE,
+                       TRENDING_WINDOW_HOURS, VIEW_COUNT_BATCH_SIZE)
+
+logger = logging.getLogger(__name__)
+
+POSTS_KEY = "trending:posts"
+GROUPS_KEY = "trending:groups"
+GROUP_IDS_KEY = "trending:group_ids"
+COMMENTS = 0
+VIEWS = 1
+
+UPSERT_SQL = (
+    "INSERT INTO {table} (post_id, group_id, hour, comments, views) "
+    "VALUES (%s, %s, %s, %s, %s) ON CONFLICT (post_id, hour) DO UPDATE "
+    "SET group_id = excluded.group_id, "
+    "comments = {table}.comments + excluded.comments, "
+    "views = {table}.views + excluded.views"
+)
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def group_key(group_id):
+    return "trending:group:{}".format(group_id)
+
+
+def hour_of(minute):
+    return dt.datetime.fromtimestamp(
+        minute * 60 - minute * 60 % 3600, tz=dt.timezone.utc
+    )
+
+
+class Ring:
+    """Кольцо из TRENDING_RING_MINUTES минутных слотов со счётчиками
+    post_id -> [комментарии, просмотры]. Слот переиспользуется, только
+    когда кольцо обошло круг, а выгрузка идёт намного чаще. Память
+    ограничена кольцом, при остановке процесса накопленное выгружается,
+    при падении теряется не больше одного интервала.
+    """
+
+    def __init__(self, size=TRENDING_RING_MINUTES):
+        self._lock = threading.Lock()
+        self._slots = [(None, None)] * size
+        self._restored = {}
+
+    def add(self, post_id, kind, count=1):
+        minute = int(time.time() // 60)
+        index = minute % len(self._slots)
+        with self._lock:
+            slot_minute, counts = self._slots[index]
+            if slot_minute != minute:
+                counts = defaultdict(lambda: [0, 0])
+                self._slots[index] = (minute, counts)
+            counts[post_id][kind] += count
+
+    def drain(self):
+        """Забирает накопленное и сводит по часам:
+        {(post_id, час): [комментарии, просмотры]}."""
+        totals = defaultdict(lambda: [0, 0])
+        with self._lock:
+            slots = self._slots
+            self._slots = [(None, None)] * len(slots)
+            restored, self._restored = self._restored, {}
+        for key, (comments, views) in restored.items():
+            totals[key] = [comments, views]
+        for minute, counts in slots:
+            if minute is None:
+                continue
+            hour = hour_of(minute)
+            for post_id, (comments, views) in counts.items():
+                total = totals[post_id, hour]
+                total[COMMENTS] += comments
+                total[VIEWS] += views
+        return totals
+
+    def restore(self, totals):
+        """Возвращает невыгруженное: его заберёт следующий drain."""
+        with self._lock:
+            for key, (comments, views) in totals.items():
+                total = self._restored.setdefault(key, [0, 0])
+                total[COMMENTS] += comments
+                total[VIEWS] += views
+
+
+ring = Ring()
+
+
+def record(post_id, kind, count=1):
+    ring.add(post_id, kind, count)
+    start_flusher()
+
+
+def record_view(post_id):
+    record(post_id, VIEWS)
+
+
+def counts_views(view):
+    """Считает просмотр страницы поста, в том числе ответ 304: его
+    @condition отдаёт, не вызывая саму вьюху."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            record_view(int(kwargs["post_id"]))
+        return response
+    return wrapper
+
+
+def record_comments(post_id, count=1):
+    record(post_id, COMMENTS, count)
+
+
+def flush():
+    """Пишет накопленное в корзины и счётчики просмотров
+    и пересчитывает списки."""
+    totals = ring.drain()
+    if totals:
+        try:
+            write(totals)
+        except Exception:
+            ring.restore(totals)
+            raise
+    refresh()
+
+
+def flush_on_exit(database):
+    totals = ring.drain()
+    # Тестовая база к выходу уже удалена, а имя снова указывает на
+    # рабочую: писать в неё чужие счётчики нельзя
+    if not totals or connection.settings_dict["NAME"] != database:
+        return
+    try:
+        write(totals)
+    except Exception:
+        logger.exception("Не удалось выгрузить счётчики при остановке")
+
+
+def run():
+    while True:
+        time.sleep(TRENDING_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Не удалось выгрузить счётчики популярного")
+        finally:
+            connection.close()
+
+
+def start_flusher():
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=run, name="trending",
+                                        daemon=True)
+            _flusher.start()
+            # Поток-демон не доживает до выгрузки при остановке воркера
+            atexit.register(flush_on_exit, connection.settings_dict["NAME"])
+
+
+def write(totals):
+    # Группу берём на момент выгрузки, заодно отбрасываем удалённые посты
+    groups = dict(Post.objects.filter(
+        pk__in={post_id for post_id, _ in totals}
+    ).values_list("pk", "group_id"))
+    rows = [
+        (post_id, groups[post_id],
+         connection.ops.adapt_datetimefield_value(hour), comments, views)
+        for (post_id, hour), (comments, views) in totals.items()
+        if post_id in groups
+    ]
+    views = Counter()
+    for (post_id, _), (_, count) in totals.items():
+        if count and post_id in groups:
+            views[post_id] += count
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            UPSERT_SQL.format(table=PostActivity._meta.db_table), rows
+        )
+        write_view_counts(views)
+    if views:
+        # Счётчики видны в карточках: страницы с этими постами обновятся
+        bump_scopes(post_scopes(views))
+    return len(rows)
+
+
+def write_view_counts(views):
+    items = sorted(views.items())
+    for start in range(0, len(items), VIEW_COUNT_BATCH_SIZE):
+        batch = items[start:start + VIEW_COUNT_BATCH_SIZE]
+        Post.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+            view_count=F("view_count") + Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in batch],
+                output_field=PositiveIntegerField()
+            )
+        )
+
+
+def refresh(now=None):
+    """Пересчитывает списки по корзинам окна и удаляет старые корзины."""
+    now = now or timezone.now()
+    since = now.replace(minute=0, second=0, microsecond=0) - dt.timedelta(
+        hours=TRENDING_WINDOW_HOURS - 1
+    )
+    PostActivity.objects.filter(hour__lt=since).delete()
+    # Корзины одного поста за разные часы могут лежать в разных группах,
+    # если пост переносили: считаем по посту, группа - текущая
+    scores = PostActivity.objects.filter(hour__gte=since).values_list(
+        "post_id", "post__group_id"
+    ).annotate(
+        score=Sum(F("comments") * TRENDING_COMMENT_WEIGHT + F("views"))
+    )
+    by_group = defaultdict(list)
+    group_scores = Counter()
+    posts = []
+    for post_id, group_id, score in scores.iterator():
+        posts.append((score, -post_id))
+        if group_id is not None:
+            by_group[group_id].append((score, -post_id))
+            group_scores[group_id] += score
+    lists = {
+        POSTS_KEY: top(posts, TRENDING_SIZE),
+        GROUPS_KEY: top([(score, -pk) for pk, score in group_scores.items()],
+                        TRENDING_SIZE),
+        GROUP_IDS_KEY: sorted(by_group),
+    }
+    for group_id, group_posts in by_group.items():
+        lists[group_key(group_id)] = top(group_posts, TRENDING_GROUP_SIZE)
+    # Группы, выпавшие из окна, больше не показывают старый список
+    cache.delete_many([
+        group_key(group_id)
+        for group_id in set(cache.get(GROUP_IDS_KEY) or ()) - set(by_group)
+    ])
+    previous = cache.get_many(list(lists))
+    cache.set_many(lists, TRENDING_CACHE_TIMEOUT)
+    if previous != lists:
+        bump_scopes(["trending"])
+    return lists
+
+
+def top(scored, size):
+    # Пары (вес, -id): при равном весе выше тот, кто раньше создан
+    return [(-pk, score) for score, pk in heapq.nlargest(size, scored)]
+
+
+def ordered(queryset, ids):
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def top_posts():
+    scored = dict(cache.get(POSTS_KEY) or [])
+    posts = ordered(Post.objects.for_feed(), list(scored))
+    for post in posts:
+        post.trending_score = scored[post.pk]
+    return posts
+
+
+def top_groups():
+    scored = dict(cache.get(GROUPS_KEY) or [])
+    groups = ordered(Group.objects.all(), list(scored))
+    for group in groups:
+        group.trending_score = scored[group.pk]
+    return groups
+
+
+def group_posts(group):
+    scored = cache.get(group_key(group.pk))
+    if not scored:
+        return []
+    return ordered(Post.objects.select_related("author"),
+                   [pk for pk, _ in scored])
@@ -1,18 +1,38 @@
-from django.urls import path
+from django.urls import path, register_converter
 
-from . import views
+from . import converters, views
+
+register_converter(converters.FeedFormatConverter, "feed")
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("feed/<feed:fmt>/", views.index_feed, name="index_feed"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
+    path(
+        "group/<slug:slug>/feed/<feed:fmt>/",
+        views.group_feed,
+        name="group_feed"
+    ),
     path("new/", views.new_post, name="new_post"),
+    path("search/", views.search, name="search"),
+    path("trending/", views.trending_index, name="trending"),
     path(
         "follow/",
         views.follow_index,
         name="follow_index"
     ),
     path("<str:username>/", views.profile, name="profile"),
+    path(
+        "<str:username>/feed/<feed:fmt>/",
+        views.profile_feed,
+        name="profile_feed"
+    ),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
+    path(
+        "<str:username>/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments"
+    ),
     path(
         "<str:username>/<int:post_id>/edit/",
         views.post_edit,
@@ -1,18 +1,30 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.http.response import Http404
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+from yatube.routers import read_replica
 
+from . import (comment_queue, conditions, follow_graph, suggestions,
+               thumbnails, timeline, trending)
 from .forms import CommentForm, PostForm
-from .models import Comment, Group, Post, User, Follow
-from .settings import PAGINATOR_PAGE_SIZE
+from .models import Group, Post, User, UserStats
+from .paginator import CommentPaginator, CursorPaginator, InvalidCursor
+from .search import SearchPaginator
+from .settings import (COMMENT_PENDING_TIMEOUT, COMMENTS_PAGE_SIZE,
+                       PAGINATOR_PAGE_SIZE)
+from .syndication import Feed
 
 
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.index_etag)
 def index(request):
-    posts = Post.objects.select_related("group")
-    paginator = Paginator(posts, PAGINATOR_PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    posts = Post.objects.for_feed()
+    paginator = CursorPaginator(posts, PAGINATOR_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("cursor"))
 
     return render(request, "index.html", {
         "page": page,
@@ -20,48 +32,115 @@ def index(request):
     })
 
 
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related("group")
-    paginator = Paginator(posts, PAGINATOR_PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    paginator = CursorPaginator(posts, PAGINATOR_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("cursor"))
 
     return render(request, "group.html", {
         "group": group,
         "page": page,
+        "paginator": paginator,
+        "trending": trending.group_posts(group)
+    })
+
+
+@read_replica
+def trending_index(request):
+    # Списки пересчитывает выгрузка счётчиков, здесь только чтение
+    return render(request, "trending.html", {
+        "posts": trending.top_posts(),
+        "groups": trending.top_groups()
+    })
+
+
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.index_etag)
+def search(request):
+    query = request.GET.get("q", "").strip()
+    paginator = SearchPaginator(query, PAGINATOR_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("cursor"))
+    return render(request, "search.html", {
+        "query": query,
+        "page": page,
         "paginator": paginator
     })
 
 
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.index_etag)
+def index_feed(request, fmt):
+    return Feed(
+        request,
+        Post.objects.for_feed(),
+        "Yatube: последние записи",
+        reverse("index")
+    ).response(fmt)
+
+
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.group_etag)
+def group_feed(request, slug, fmt):
+    group = get_object_or_404(Group, slug=slug)
+    return Feed(
+        request,
+        group.posts.for_feed(),
+        "Yatube: {}".format(group.title),
+        reverse("group", kwargs={"slug": slug})
+    ).response(fmt)
+
+
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.profile_etag)
+def profile_feed(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+    return Feed(
+        request,
+        author.posts.for_feed(),
+        "Yatube: записи {}".format(author.username),
+        reverse("profile", kwargs={"username": username})
+    ).response(fmt)
+
+
 @login_required
+@transaction.atomic
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None,)
     if form.is_valid():
         new_form = form.save(commit=False)
         new_form.author = request.user
         new_form.save()
+        if new_form.image:
+            thumbnails.schedule(new_form)
         return redirect("index")
     form = PostForm()
     return render(request, "new.html", {"form": form})
 
 
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.profile_etag)
 def profile(request, username):
-    user_profile = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(
-        author=user_profile
-    ).select_related("group")
-    paginator = Paginator(posts, PAGINATOR_PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    user_profile = get_object_or_404(
+        User.objects.select_related("stats"),
+        username=username
+    )
+    stats = UserStats.objects.get_for(user_profile)
+    posts = user_profile.posts.for_feed()
+    paginator = CursorPaginator(posts, PAGINATOR_PAGE_SIZE,
+                                total=stats.posts_count)
+    page = paginator.get_page(request.GET.get("cursor"))
     user = request.user
-    followed_count = Follow.objects.filter(author=user_profile).count()
-    following_count = Follow.objects.filter(user=user_profile).count()
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=user_profile
-        ).exists()
+        following = follow_graph.is_following(request.user, user_profile)
     else:
         following = None
     return render(request, "profile.html", {
@@ -69,44 +148,93 @@ def profile(request, username):
         "user": user,
         "user_profile": user_profile,
         "paginator": paginator,
-        "followed_count": followed_count,
-        "following_count": following_count,
-        "following": following
+        "followed_count": stats.followers_count,
+        "following_count": stats.following_count,
+        "posts_count": stats.posts_count,
+        "following": following,
+        "suggestions": suggestions.for_user(user)
     })
 
 
+@read_replica
+@trending.counts_views
+@vary_on_cookie
+@condition(etag_func=conditions.post_etag)
 def post_view(request, username, post_id):
+    # Пост, автор со счётчиками и группа одним запросом. Если в адресе
+    # чужое имя, перенаправляем по тому же объекту
+    post = get_object_or_404(
+        Post.objects.select_related("author__stats", "group"),
+        id=post_id
+    )
+    if post.author.username != username:
+        return redirect("post", username=post.author.username,
+                        post_id=post_id)
+    paginator = CommentPaginator(post, COMMENTS_PAGE_SIZE)
     try:
-        post = get_object_or_404(Post, id=post_id, author__username=username)
-    except Http404:
-        return redirect(
-            "post",
-            username=Post.objects.get(id=post_id).author.username,
-            post_id=post_id
-        )
-    comments = Comment.objects.filter(
-        post__id=post_id
-    ).select_related("author")
+        comments, next_cursor = paginator.thread(request.GET.get("cursor"))
+    except InvalidCursor:
+        comments, next_cursor = paginator.thread()
+    pending_comments = comment_queue.pending(post_id, request.user)
     user_profile = post.author
-    post_count = user_profile.posts.count()
+    stats = UserStats.objects.get_for(user_profile)
     user = request.user
-    followed_count = Follow.objects.filter(author=user_profile).count()
-    following_count = Follow.objects.filter(user=user_profile).count()
+    if user.is_authenticated:
+        following = follow_graph.is_following(user, user_profile)
+    else:
+        following = None
     form = CommentForm()
     return render(request, "post.html", {
         "post": post,
         "user": user,
         "post_id": post_id,
-        "post_count": post_count,
+        "post_count": stats.posts_count,
         "user_profile": user_profile,
         "comments": comments,
+        "comments_cursor": next_cursor,
+        "pending_comments": pending_comments,
         "form": form,
-        "followed_count": followed_count,
-        "following_count": following_count,
+        "followed_count": stats.followers_count,
+        "following_count": stats.following_count,
+        "following": following,
+    })
+
+
+@read_replica
+@vary_on_cookie
+@condition(etag_func=conditions.post_etag)
+def post_comments(request, username, post_id):
+    """Следующие страницы ветки комментариев: HTML-фрагмент для
+    подгрузки на странице поста или JSON при format=json."""
+    post = get_object_or_404(
+        Post.objects.select_related("author"),
+        id=post_id,
+        author__username=username
+    )
+    paginator = CommentPaginator(post, COMMENTS_PAGE_SIZE)
+    try:
+        comments, next_cursor = paginator.thread(request.GET.get("cursor"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Некорректный курсор")
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "comments": [{
+                "id": comment.pk,
+                "author": comment.author.username,
+                "text": comment.text,
+                "created": comment.created.isoformat(),
+            } for comment in comments],
+            "next_cursor": next_cursor,
+        })
+    return render(request, "comments_page.html", {
+        "post": post,
+        "comments": comments,
+        "comments_cursor": next_cursor,
     })
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     if post.author != request.user:
@@ -117,51 +245,66 @@ def post_edit(request, username, post_id):
         instance=post
     )
     if form.is_valid():
+        if "image" in form.changed_data:
+            # Варианты старой картинки больше не годятся: пока воркер
+            # не сделает новые, карточки покажут оригинал
+            post.image_thumb = post.image_preview = ""
         form.save()
+        if "image" in form.changed_data:
+            thumbnails.schedule(post)
         return redirect("post", username=username, post_id=post_id)
     return render(request, "new.html", {"form": form, "post": post})
 
 
 @login_required
 def add_comment(request, username, post_id):
+    post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        new_form = form.save(commit=False)
-        new_form.post = Post.objects.get(id=post_id)
-        new_form.author = request.user
-        new_form.save()
+        if comment_queue.is_hot(post_id):
+            entry = comment_queue.enqueue(post_id, request.user,
+                                          form.cleaned_data["text"])
+            response = redirect(post_view, username=username,
+                                post_id=post_id)
+            response.set_cookie(comment_queue.PENDING_COOKIE, entry["token"],
+                                max_age=COMMENT_PENDING_TIMEOUT,
+                                httponly=True)
+            return response
+        with transaction.atomic():
+            new_form = form.save(commit=False)
+            new_form.post = post
+            new_form.author = request.user
+            new_form.save()
         return redirect(post_view, username=username, post_id=post_id)
     form = CommentForm()
     return render(request, "comment.html", {"form": form})
 
 
+@read_replica
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, PAGINATOR_PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    paginator = timeline.TimelinePaginator(request.user, PAGINATOR_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("cursor"))
     return render(request, "follow.html", {
         "page": page,
-        "paginator": paginator
+        "paginator": paginator,
+        "suggestions": suggestions.for_user(request.user)
     })
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(user=request.user, author=author).exists()
-    if not follow and author != request.user:
-        Follow.objects.create(user=request.user, author=author)
+    follow_graph.follow(request.user, author)
     return redirect("profile", username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(user=request.user, author=author)
-    if follow:
-        follow.delete()
+    follow_graph.unfollow(request.user, author)
     return redirect("profile", username=username)
 
 
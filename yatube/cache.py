@@ -0,0 +1,108 @@
+import pickle
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class TwoTierCache(BaseCache):
+    """Двухуровневый кеш: L1 - LRU-словарь в памяти процесса с коротким
+    TTL, L2 - общий для всех воркеров кеш из CACHES[OPTIONS["L2"]].
+
+    Удаление и incr видны другим процессам не сразу, а через L1_TIMEOUT,
+    поэтому через L1 стоит пускать только данные, которые инвалидируются
+    сменой ключа (фрагменты лент с версией в ключе) или редко меняются.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._l2_alias = options.get("L2", "default")
+        self._l1_timeout = options.get("L1_TIMEOUT", 5)
+        self._l1_max_entries = options.get("L1_MAX_ENTRIES", 1000)
+        self._l1 = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self._l2_timeout(timeout)
+        if timeout is None:
+            timeout = self._l1_timeout
+        expires = time.monotonic() + min(timeout, self._l1_timeout)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._l1[key] = (expires, pickled)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self._lock:
+            self._l1.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_key(key, version=version)
+        self.validate_key(l1_key)
+        value = self._l1_get(l1_key)
+        if value is not None:
+            return value
+        value = self.l2.get(key, version=version)
+        if value is None:
+            return default
+        self._l1_set(l1_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_key(key, version=version)
+        self.validate_key(l1_key)
+        self.l2.set(key, value, self._l2_timeout(timeout), version=version)
+        self._l1_set(l1_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, self._l2_timeout(timeout),
+                            version=version)
+        if added:
+            self._l1_set(self.make_key(key, version=version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, self._l2_timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        l1_key = self.make_key(key, version=version)
+        return (self._l1_get(l1_key) is not None
+                or self.l2.has_key(key, version=version))
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
+
+    def _l2_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
@@ -0,0 +1,172 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Границы корзин гистограмм, мс
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+TIMINGS = ("total", "sql", "render")
+WINDOW = 60
+
+# Замеры текущего запроса, шаблоны добавляют сюда время рендера
+current = threading.local()
+
+
+def option(name, default):
+    return getattr(settings, "METRICS", {}).get(name, default)
+
+
+def empty_stats():
+    stats = {"count": 0, "queries": 0}
+    for timing in TIMINGS:
+        stats[timing] = [0] * (len(BUCKETS) + 1) + [0.0]
+    return stats
+
+
+def observe(histogram, value):
+    for i, bound in enumerate(BUCKETS):
+        if value <= bound:
+            break
+    else:
+        i = len(BUCKETS)
+    histogram[i] += 1
+    histogram[-1] += value
+
+
+def merge(target, stats):
+    target["count"] += stats["count"]
+    target["queries"] += stats["queries"]
+    for timing in TIMINGS:
+        target[timing] = [
+            a + b for a, b in zip(target[timing], stats[timing])
+        ]
+
+
+class Recorder:
+    """Копит гистограммы по маршрутам в памяти процесса и раз в
+    FLUSH_INTERVAL секунд выкладывает снимок в кеш.
+
+    Снимки хранятся по минутным окнам. Каждый процесс пишет только свой
+    слот окна, номер слота выдаёт атомарный incr, поэтому процессы
+    не затирают данные друг друга.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._slots = {}
+        self._flushed = 0
+
+    @property
+    def cache(self):
+        return caches[option("CACHE", "default")]
+
+    @property
+    def retention(self):
+        return option("RETENTION", 300) // WINDOW
+
+    def key(self, window, slot):
+        return "metrics:{}:{}".format(window, slot)
+
+    def record(self, route, queries, timings):
+        window = int(time.time() // WINDOW)
+        with self._lock:
+            routes = self._windows.setdefault(window, {})
+            stats = routes.setdefault(route, empty_stats())
+            stats["count"] += 1
+            stats["queries"] += queries
+            for timing in TIMINGS:
+                observe(stats[timing], timings[timing])
+        if time.monotonic() - self._flushed >= option("FLUSH_INTERVAL", 10):
+            self.flush()
+
+    def slot(self, window):
+        if window not in self._slots:
+            slots_key = self.key(window, "slots")
+            self.cache.add(slots_key, 0, self.retention * WINDOW * 2)
+            self._slots[window] = self.cache.incr(slots_key)
+        return self._slots[window]
+
+    def flush(self):
+        current_window = int(time.time() // WINDOW)
+        with self._lock:
+            self._flushed = time.monotonic()
+            for window in list(self._windows):
+                if window <= current_window - self.retention:
+                    del self._windows[window]
+                    self._slots.pop(window, None)
+            snapshot = copy.deepcopy(self._windows)
+        for window, routes in snapshot.items():
+            self.cache.set(self.key(window, self.slot(window)), routes,
+                           self.retention * WINDOW * 2)
+
+    def collect(self):
+        """Сводка по всем процессам за последние RETENTION секунд."""
+        self.flush()
+        current_window = int(time.time() // WINDOW)
+        result = {}
+        for window in range(current_window - self.retention + 1,
+                            current_window + 1):
+            slots = self.cache.get(self.key(window, "slots")) or 0
+            snapshots = self.cache.get_many([
+                self.key(window, slot) for slot in range(1, slots + 1)
+            ])
+            for routes in snapshots.values():
+                for route, stats in routes.items():
+                    merge(result.setdefault(route, empty_stats()), stats)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+            self._slots.clear()
+            self._flushed = 0
+
+
+recorder = Recorder()
+
+
+def to_json(collected):
+    routes = {}
+    for route, stats in sorted(collected.items()):
+        count = stats["count"] or 1
+        routes[route] = {
+            "count": stats["count"],
+            "queries_avg": stats["queries"] / count,
+        }
+        for timing in TIMINGS:
+            routes[route][timing + "_ms_avg"] = stats[timing][-1] / count
+            routes[route][timing + "_ms_buckets"] = dict(zip(
+                [str(bound) for bound in BUCKETS] + ["+Inf"],
+                stats[timing][:-1]
+            ))
+    return {"buckets_ms": BUCKETS, "routes": routes}
+
+
+def to_prometheus(collected):
+    lines = []
+    for timing in TIMINGS:
+        name = "yatube_{}_seconds".format(timing)
+        lines.append("# TYPE {} histogram".format(name))
+        for route, stats in sorted(collected.items()):
+            cumulative = 0
+            bounds = [bound / 1000 for bound in BUCKETS] + ["+Inf"]
+            for bound, count in zip(bounds, stats[timing][:-1]):
+                cumulative += count
+                lines.append('{}_bucket{{route="{}",le="{}"}} {}'.format(
+                    name, route, bound, cumulative
+                ))
+            lines.append('{}_sum{{route="{}"}} {}'.format(
+                name, route, stats[timing][-1] / 1000
+            ))
+            lines.append('{}_count{{route="{}"}} {}'.format(
+                name, route, stats["count"]
+            ))
+    lines.append("# TYPE yatube_queries_total counter")
+    for route, stats in sorted(collected.items()):
+        lines.append('yatube_queries_total{{route="{}"}} {}'.format(
+            route, stats["queries"]
+        ))
+    return "\n".join(lines) + "\n"
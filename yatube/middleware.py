@@ -0,0 +1,66 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger("yatube.sql")
+
+
+class MetricsMiddleware:
+    """Считает запросы к базе, время SQL, рендера шаблонов и всего
+    запроса, складывает их в гистограммы по имени маршрута и отдаёт
+    в заголовке Server-Timing. Медленные запросы пишет в лог."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+        metrics.current.render = 0.0
+        metrics.current.depth = 0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    lambda *args: self.execute(queries, *args)
+                ))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        render = metrics.current.render
+        del metrics.current.render
+
+        match = request.resolver_match
+        route = match.view_name if match else "unresolved"
+        sql = sum(duration for duration, _ in queries)
+        self.log_slow(queries, route, match)
+        metrics.recorder.record(route, len(queries), {
+            "total": total * 1000,
+            "sql": sql * 1000,
+            "render": render * 1000,
+        })
+        response["Server-Timing"] = (
+            'sql;dur={:.1f};desc="{} queries", render;dur={:.1f}, '
+            'total;dur={:.1f}'.format(
+                sql * 1000, len(queries), render * 1000, total * 1000
+            )
+        )
+        return response
+
+    def execute(self, queries, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append((time.perf_counter() - start, sql))
+
+    def log_slow(self, queries, route, match):
+        threshold = metrics.option("SLOW_QUERY_MS", 100) / 1000
+        view = match._func_path if match else "-"
+        for duration, sql in sorted(queries, reverse=True):
+            if duration < threshold:
+                break
+            logger.warning("%.1f мс %s (%s): %s", duration * 1000, route,
+                           view, sql)
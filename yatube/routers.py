@@ -0,0 +1,88 @@
+import random
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+
+# Алиас реплики для чтения в текущем запросе. None - всё идёт в primary
+state = threading.local()
+
+# Сессии пишутся на каждом входе, а request.user нужен сразу после
+# регистрации: читать их с отстающей реплики нельзя
+PRIMARY_APPS = {"auth", "sessions"}
+
+STICKY_COOKIE = "yatube_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def read_replica(view):
+    """Помечает вьюху только для чтения: её запросы можно отдать
+    реплике. Всё, что не помечено, читает из primary."""
+    view.read_replica = True
+    return view
+
+
+def resolve_mirror(alias):
+    """В тестах реплика - зеркало default (TEST.MIRROR) над той же базой.
+    Отдельное соединение не видит открытую транзакцию теста, поэтому
+    читаем прямо через то, что она зеркалит."""
+    mirror = settings.DATABASES.get(alias, {}).get("TEST", {}).get("MIRROR")
+    if mirror and (connections[alias].settings_dict["NAME"]
+                   == connections[mirror].settings_dict["NAME"]):
+        return mirror
+    return alias
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return "default"
+        return getattr(state, "alias", None) or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии primary, объекты из них можно связывать
+        return True
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплики для помеченных вьюх и держит
+    пользователя на primary REPLICA_STICKY_SECONDS секунд после его
+    записи, чтобы он сразу видел свои изменения."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        state.alias = None
+        try:
+            with connections["default"].execute_wrapper(
+                partial(self.track_writes, writes)
+            ):
+                response = self.get_response(request)
+        finally:
+            state.alias = None
+        if writes:
+            response.set_cookie(
+                STICKY_COOKIE, "1",
+                max_age=getattr(settings, "REPLICA_STICKY_SECONDS", 10),
+                httponly=True
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if (replicas and getattr(view_func, "read_replica", False)
+                and request.method in SAFE_METHODS
+                and STICKY_COOKIE not in request.COOKIES):
+            state.alias = resolve_mirror(random.choice(replicas))
+
+    def track_writes(self, writes, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith(WRITES):
+            writes.append(True)
+        return execute(sql, params, many, context)
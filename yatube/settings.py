@@ -47,12 +47,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'yatube.middleware.MetricsMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,17 +61,33 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# debug_toolbar слишком тяжёл для боевой нагрузки, в проде метрики
+# собирает MetricsMiddleware
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Гистограммы MetricsMiddleware: в каком кеше их хранить, за сколько
+# секунд показывать, как часто процессу сбрасывать свои замеры в кеш
+# и с какой длительности запрос к базе считается медленным
+METRICS = {
+    'CACHE': 'default',
+    'RETENTION': 300,
+    'FLUSH_INTERVAL': 10,
+    'SLOW_QUERY_MS': 100,
+}
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 INCLUDES_DIR = os.path.join(BASE_DIR, "templates", "includes")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.template.InstrumentedTemplates',
         'DIRS': [TEMPLATES_DIR, INCLUDES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,11 +96,42 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.feed_cache',
             ],
         },
     },
 ]
 
+# YATUBE_TEMPLATES=production: шаблоны читаются и разбираются один раз
+# на процесс (cached.Loader) и без отладочной информации, даже при
+# DEBUG. В default правки шаблонов видны без перезапуска сервера.
+# Сравнить профили: manage.py benchmark_templates.
+TEMPLATE_PROFILE = os.environ.get("YATUBE_TEMPLATES", "default")
+
+TEMPLATE_PROFILES = {
+    "default": {
+        'APP_DIRS': True,
+        'OPTIONS': {},
+    },
+    "production": {
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'loaders': [(
+                'django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]
+            )],
+            'debug': False,
+        },
+    },
+}
+
+TEMPLATES[0]['APP_DIRS'] = TEMPLATE_PROFILES[TEMPLATE_PROFILE]['APP_DIRS']
+TEMPLATES[0]['OPTIONS'].update(
+    TEMPLATE_PROFILES[TEMPLATE_PROFILE]['OPTIONS']
+)
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -99,6 +145,67 @@ DATABASES = {
     }
 }
 
+# YATUBE_DATABASE=replica добавляет реплику для чтения: вьюхи, помеченные
+# read_replica, читают из неё, всё остальное и все записи идут в default.
+# Локально это второй файл SQLite, который обновляет команда
+# sync_replica. Пока реплика отстаёт, фрагменты лент могут закешироваться
+# со старыми данными, поэтому отставание должно быть много меньше
+# FEED_CACHE_TIMEOUT.
+DATABASE_PROFILE = os.environ.get("YATUBE_DATABASE", "single")
+
+DATABASE_REPLICAS = []
+
+if DATABASE_PROFILE == "replica":
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            "YATUBE_REPLICA_NAME",
+            os.path.join(BASE_DIR, 'db.replica.sqlite3')
+        ),
+        # В тестах реплика - зеркало default: вьюхи видят данные теста.
+        # Отдельную базу реплики заводит себе ReplicaDatabaseTest
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# YATUBE_SQLITE=production настраивает каждое соединение с SQLite
+# (yatube.sqlite): журнал WAL, чтобы писатели не блокировали читателей,
+# synchronous=NORMAL, отображение файла в память, больший кеш страниц и
+# ожидание блокировки вместо ошибки. Соединения живут между запросами.
+# Сравнить профили под нагрузкой: manage.py benchmark_sqlite.
+SQLITE_PROFILE = os.environ.get("YATUBE_SQLITE", "default")
+
+SQLITE_PROFILES = {
+    "default": {
+        'PRAGMAS': {},
+        'CONN_MAX_AGE': 0,
+    },
+    "production": {
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'busy_timeout': 5000,
+            'temp_store': 'MEMORY',
+        },
+        'CONN_MAX_AGE': 600,
+    },
+}
+
+SQLITE_PRAGMAS = SQLITE_PROFILES[SQLITE_PROFILE]['PRAGMAS']
+
+for database in DATABASES.values():
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['CONN_MAX_AGE'] = SQLITE_PROFILES[SQLITE_PROFILE][
+            'CONN_MAX_AGE'
+        ]
+
+DATABASE_ROUTERS = ['yatube.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только из primary
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -146,14 +253,62 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Очередь комментариев горячих постов, см. posts.comment_queue. Каталог
+# должен быть общим для всех процессов сервера
+COMMENT_SPOOL_DIR = os.path.join(BASE_DIR, "spool", "comments")
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 # LOGOUT_REDIRECT_URL = "index"
 
 SITE_ID = 1
 
-CACHES = {
-    'default': {
+# Cache
+# YATUBE_CACHE выбирает профиль: locmem (разработка и тесты), db или file
+# для одного сервера, remote для внешнего кеша (memcached, redis), класс
+# и адрес которого задаются в YATUBE_CACHE_BACKEND и YATUBE_CACHE_LOCATION.
+# Фрагменты шаблонов идут через алиас fragments: в общих профилях это
+# двухуровневый кеш с L1 в памяти воркера поверх default.
+
+CACHE_PROFILE = os.environ.get("YATUBE_CACHE", "locmem")
+
+CACHE_PROFILES = {
+    "locmem": {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'yatube',
+    },
+    "db": {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+    },
+    "file": {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    "remote": {
+        'BACKEND': os.environ.get(
+            "YATUBE_CACHE_BACKEND",
+            'django.core.cache.backends.memcached.MemcachedCache'
+        ),
+        'LOCATION': os.environ.get(
+            "YATUBE_CACHE_LOCATION",
+            '127.0.0.1:11211'
+        ),
+    },
+}
+
+CACHES = {
+    'default': CACHE_PROFILES[CACHE_PROFILE],
+    'fragments': {
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'OPTIONS': {
+            'L2': 'default',
+            'L1_TIMEOUT': 5,
+            'L1_MAX_ENTRIES': 1000,
+        },
+    },
 }
+
+if CACHE_PROFILE == "locmem":
+    # L2 и так живёт в памяти процесса, второй уровень не нужен
+    CACHES['fragments'] = CACHES['default']
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(connection, pragmas):
+    # Напрямую через sqlite3, мимо курсора Django: прагмы не должны
+    # попадать в замеры запросов
+    for name, value in pragmas.items():
+        connection.connection.execute("PRAGMA {} = {}".format(name, value))
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if connection.vendor == "sqlite" and pragmas:
+        apply_pragmas(connection, pragmas)
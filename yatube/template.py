@@ -0,0 +1,36 @@
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from . import metrics
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        # Вложенный render_to_string уже учтён во внешнем шаблоне
+        depth = getattr(metrics.current, "depth", 0)
+        metrics.current.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.current.depth = depth
+            if depth == 0 and hasattr(metrics.current, "render"):
+                metrics.current.render += time.perf_counter() - start
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """DjangoTemplates, который засчитывает время рендера в замеры
+    текущего запроса."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -3,8 +3,11 @@ from django.contrib.flatpages import views
 from django.urls import include, path
 from django.conf.urls import handler404, handler500
 
+from .views import metrics_view
+
 urlpatterns = [
         path("admin/", admin.site.urls),
+        path("metrics/", metrics_view, name="metrics"),
         path("auth/", include("users.urls")),
         path("auth/", include("django.contrib.auth.urls")),
 ]
@@ -0,0 +1,13 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+
+
+@staff_member_required
+def metrics_view(request):
+    collected = metrics.recorder.collect()
+    if request.GET.get("format") == "prometheus":
+        return HttpResponse(metrics.to_prometheus(collected),
+                            content_type="text/plain; version=0.0.4")
+    return JsonResponse(metrics.to_json(collected))